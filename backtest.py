@@ -1,5 +1,4 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
@@ -7,6 +6,11 @@ from plotly.subplots import make_subplots
 from ta.trend import MACD
 from ta.momentum import RSIIndicator
 from ta.volatility import AverageTrueRange
+from ohlcv_store import load_ohlcv, prefetch_ohlcv
+from chart_utils import line_trace, marker_trace
+from backtest_engine import SWEEP_PARAMETERS, extract_trades, run_sweep
+from portfolio import REBALANCE_FREQUENCIES, backtest_portfolio, price_matrices
+from perf import StageTimer
 
 # Define the list of top 30 most traded stocks and ETFs
 top_30 = ['NVDA', 'TSLA', 'TSM', 'SOXL', 'NVDL', 'TQQQ', 'AAPL', 'AMD', 'SMCI', 'MSFT', 
@@ -25,8 +29,34 @@ date_range = st.sidebar.date_input('Select date range', [start_date, end_date])
 
 
 indicator = st.sidebar.selectbox("Select an indicator", ["MACD", "RSI", "ATR", "SMA Crossover"])
+mode = st.sidebar.radio("Mode", ["Single backtest", "Parameter sweep", "Portfolio"])
 
-if indicator == "MACD":
+# Sweep ranges: (label, min, max, default range, default step) per parameter
+sweep_ranges = {
+    "fast_period": ("Fast period", 5, 50, (8, 20), 1),
+    "slow_period": ("Slow period", 10, 100, (20, 40), 2),
+    "signal_period": ("Signal period", 5, 20, (5, 15), 2),
+    "rsi_period": ("RSI period", 5, 30, (7, 21), 1),
+    "overbought": ("Overbought level", 60, 90, (65, 85), 5),
+    "oversold": ("Oversold level", 10, 40, (15, 35), 5),
+    "atr_period": ("ATR period", 5, 30, (7, 28), 1),
+    "atr_multiplier": ("ATR multiplier", 1.0, 5.0, (1.0, 4.0), 0.25),
+    "short_window": ("Short SMA window", 1, 50, (5, 30), 1),
+    "long_window": ("Long SMA window", 10, 100, (20, 100), 5),
+}
+
+if mode == "Parameter sweep":
+    sweep_values = {}
+    for name in SWEEP_PARAMETERS[indicator]:
+        label, low, high, default, step = sweep_ranges[name]
+        selected = st.sidebar.slider(f"{label} range", low, high, default)
+        step = st.sidebar.number_input(f"{label} step", min_value=step, value=step, step=step)
+        if isinstance(step, int):
+            sweep_values[name] = list(range(selected[0], selected[1] + 1, step))
+        else:
+            sweep_values[name] = [round(value, 6) for value in np.arange(selected[0], selected[1] + step / 2, step)]
+    st.sidebar.caption(f"Up to {int(np.prod([len(v) for v in sweep_values.values()])):,} combinations")
+elif indicator == "MACD":
     fast_period = st.sidebar.slider("Fast period", 5, 50, 12)
     slow_period = st.sidebar.slider("Slow period", 10, 100, 26)
     signal_period = st.sidebar.slider("Signal period", 5, 20, 9)
@@ -41,112 +71,207 @@ elif indicator == "SMA Crossover":
     short_window = st.sidebar.slider("Short SMA window", 1, 50, 10)
     long_window = st.sidebar.slider("Long SMA window", 10, 100, 30)
 
+if mode == "Portfolio":
+    allocation = st.sidebar.radio("Allocation", ["Equal weight", "Signal-weighted"])
+    rebalance = st.sidebar.selectbox("Rebalance", list(REBALANCE_FREQUENCIES), index=2)
+
+timer = StageTimer("backtest.py")
+
 # Download data
 @st.cache_data
 def download_data(ticker, start_date, end_date):
-    data = yf.download(ticker, start=start_date, end=end_date)
+    data = load_ohlcv(ticker, start_date, end_date)
     return data
 
-data = download_data(ticker,date_range[0], date_range[1])
+# Prefetch the whole universe so switching tickers reads from the local store
+@st.cache_data(show_spinner="Prefetching all tickers...")
+def prefetch_universe(tickers, start_date, end_date):
+    return prefetch_ohlcv(list(tickers), start_date, end_date)
 
-# Calculate indicators
-if indicator == "MACD":
-    macd = MACD(data['Close'], window_fast=fast_period, window_slow=slow_period, window_sign=signal_period)
-    data['MACD'] = macd.macd()
-    data['Signal'] = macd.macd_signal()
-    data['Buy'] = (data['MACD'] > data['Signal']) & (data['MACD'].shift(1) <= data['Signal'].shift(1))
-    data['Sell'] = (data['MACD'] < data['Signal']) & (data['MACD'].shift(1) >= data['Signal'].shift(1))
-elif indicator == "RSI":
-    rsi = RSIIndicator(data['Close'], window=rsi_period)
-    data['RSI'] = rsi.rsi()
-    data['Buy'] = (data['RSI'] < oversold) & (data['RSI'].shift(1) >= oversold)
-    data['Sell'] = (data['RSI'] > overbought) & (data['RSI'].shift(1) <= overbought)
-elif indicator == "ATR":
-    atr = AverageTrueRange(data['High'], data['Low'], data['Close'], window=atr_period)
-    data['ATR'] = atr.average_true_range()
-    data['Upper'] = data['Close'].rolling(window=atr_period).mean() + atr_multiplier * data['ATR']
-    data['Lower'] = data['Close'].rolling(window=atr_period).mean() - atr_multiplier * data['ATR']
-    data['Buy'] = (data['Close'] > data['Upper']) & (data['Close'].shift(1) <= data['Upper'].shift(1))
-    data['Sell'] = (data['Close'] < data['Lower']) & (data['Close'].shift(1) >= data['Lower'].shift(1))
-elif indicator == "SMA Crossover":
-    data['SMA_Short'] = data['Close'].rolling(window=short_window).mean()
-    data['SMA_Long'] = data['Close'].rolling(window=long_window).mean()
-    data['Buy'] = (data['SMA_Short'] > data['SMA_Long']) & (data['SMA_Short'].shift(1) <= data['SMA_Long'].shift(1))
-    data['Sell'] = (data['SMA_Short'] < data['SMA_Long']) & (data['SMA_Short'].shift(1) >= data['SMA_Long'].shift(1))
-
-# Backtesting
-data['Position'] = np.nan
-data.loc[data['Buy'], 'Position'] = 1
-data.loc[data['Sell'], 'Position'] = 0
-data['Position'] = data['Position'].ffill().fillna(0)
-data['Strategy'] = data['Position'].shift(1) * data['Close'].pct_change()
-data['Benchmark'] = data['Close'].pct_change()
-
-# Calculate cumulative returns
-data['Cum_Strategy'] = (1 + data['Strategy']).cumprod()
-data['Cum_Benchmark'] = (1 + data['Benchmark']).cumprod()
+if st.sidebar.checkbox(f"Prefetch all {len(top_30)} tickers", value=False):
+    with timer.stage("prefetch"):
+        prefetch_report = prefetch_universe(tuple(top_30), date_range[0], date_range[1])
+    failed = prefetch_report[prefetch_report['Error'].notna()]
+    with st.sidebar.expander(f"Prefetch report ({len(failed)} failed)", expanded=not failed.empty):
+        st.dataframe(prefetch_report.style.format({'Seconds': '{:.2f}'}), hide_index=True)
+
+with timer.stage("fetch"):
+    data = download_data(ticker,date_range[0], date_range[1])
+
+# Parameter sweep: evaluate the whole grid at once instead of one slider value per rerun
+@st.cache_data(show_spinner="Running parameter sweep...")
+def cached_sweep(data, indicator, sweep_values):
+    return run_sweep(data, indicator, sweep_values)
+
+if mode == "Parameter sweep":
+    with timer.stage("compute"):
+        results = cached_sweep(data, indicator, sweep_values)
+    if results.empty:
+        st.warning("No valid parameter combinations: the fast/short range must start below the slow/long range.")
+        st.stop()
+    with timer.stage("render"):
+        param_names = SWEEP_PARAMETERS[indicator]
+        st.subheader(f"{ticker} {indicator} Parameter Sweep ({len(results):,} combinations)")
+
+        col_x, col_y = st.columns(2)
+        x_param = col_x.selectbox("Heatmap x-axis", param_names, index=0)
+        y_param = col_y.selectbox("Heatmap y-axis", param_names, index=1)
+        if x_param != y_param:
+            # Best total return over the parameters not on the axes
+            heat = results.pivot_table(index=y_param, columns=x_param, values='total_return', aggfunc='max')
+            fig = go.Figure(go.Heatmap(z=heat.values, x=heat.columns, y=heat.index, colorscale='RdYlGn', zmid=0,
+                                       colorbar=dict(title="Total Return", tickformat=".0%")))
+            fig.update_layout(xaxis_title=x_param, yaxis_title=y_param, height=500)
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.subheader("Ranked Results")
+        st.dataframe(results.head(100).style.format({'total_return': '{:.2%}', 'max_drawdown': '{:.2%}', 'win_rate': '{:.2%}'}),
+                     hide_index=True)
+    st.stop()
+
+# Portfolio: the same strategy on every ticker at once, on aligned price matrices
+@st.cache_data(show_spinner="Loading universe...")
+def load_universe(tickers, start_date, end_date):
+    return price_matrices({t: load_ohlcv(t, start_date, end_date) for t in tickers})
+
+if mode == "Portfolio":
+    if indicator == "MACD":
+        params = {'fast_period': fast_period, 'slow_period': slow_period, 'signal_period': signal_period}
+    elif indicator == "RSI":
+        params = {'rsi_period': rsi_period, 'overbought': overbought, 'oversold': oversold}
+    elif indicator == "ATR":
+        params = {'atr_period': atr_period, 'atr_multiplier': atr_multiplier}
+    elif indicator == "SMA Crossover":
+        params = {'short_window': short_window, 'long_window': long_window}
+    with timer.stage("fetch"):
+        matrices = load_universe(tuple(top_30), date_range[0], date_range[1])
+    with timer.stage("compute"):
+        result = backtest_portfolio(matrices['High'], matrices['Low'], matrices['Close'], indicator, params, allocation, rebalance)
+    with timer.stage("render"):
+        equity, benchmark = result['equity'], result['benchmark']
+        st.subheader(f"{indicator} Portfolio across {matrices['Close'].shape[1]} tickers ({allocation}, {rebalance} rebalance)")
+
+        fig = go.Figure()
+        fig.add_trace(line_trace(equity.index, equity, name="Strategy Portfolio"))
+        fig.add_trace(line_trace(benchmark.index, benchmark, name="Equal-Weight Benchmark"))
+        fig.update_layout(height=500, yaxis_title="Growth of $1")
+        st.plotly_chart(fig, use_container_width=True)
+
+        drawdown = (equity / equity.cummax() - 1).min()
+        years_held = max((equity.index[-1] - equity.index[0]).days / 365.25, 1 / 365.25)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Portfolio Return", f"{equity.iloc[-1] - 1:.2%}")
+        col2.metric("CAGR", f"{equity.iloc[-1] ** (1 / years_held) - 1:.2%}")
+        col3.metric("Max Drawdown", f"{drawdown:.2%}")
+        col4, col5, col6 = st.columns(3)
+        col4.metric("Benchmark Return", f"{benchmark.iloc[-1] - 1:.2%}")
+        col5.metric("Avg Turnover / Rebalance", f"{result['turnover'].mean() if len(result['turnover']) else 0:.2%}")
+        col6.metric("Annual Turnover", f"{result['turnover'].sum() / years_held:.2f}x")
+
+        st.subheader("Per-Ticker Contribution to Return")
+        contributions = pd.DataFrame({'Contribution': result['contributions'], 'Current Weight': result['weights']})
+        fig_contrib = go.Figure(go.Bar(x=contributions.index, y=contributions['Contribution'],
+                                       marker_color=np.where(contributions['Contribution'] >= 0, 'green', 'red')))
+        fig_contrib.update_layout(yaxis_tickformat=".1%", height=400)
+        st.plotly_chart(fig_contrib, use_container_width=True)
+        st.dataframe(contributions.style.format('{:.2%}'))
+    st.stop()
+
+with timer.stage("compute"):
+    # Calculate indicators
+    if indicator == "MACD":
+        macd = MACD(data['Close'], window_fast=fast_period, window_slow=slow_period, window_sign=signal_period)
+        data['MACD'] = macd.macd()
+        data['Signal'] = macd.macd_signal()
+        data['Buy'] = (data['MACD'] > data['Signal']) & (data['MACD'].shift(1) <= data['Signal'].shift(1))
+        data['Sell'] = (data['MACD'] < data['Signal']) & (data['MACD'].shift(1) >= data['Signal'].shift(1))
+    elif indicator == "RSI":
+        rsi = RSIIndicator(data['Close'], window=rsi_period)
+        data['RSI'] = rsi.rsi()
+        data['Buy'] = (data['RSI'] < oversold) & (data['RSI'].shift(1) >= oversold)
+        data['Sell'] = (data['RSI'] > overbought) & (data['RSI'].shift(1) <= overbought)
+    elif indicator == "ATR":
+        atr = AverageTrueRange(data['High'], data['Low'], data['Close'], window=atr_period)
+        data['ATR'] = atr.average_true_range()
+        data['Upper'] = data['Close'].rolling(window=atr_period).mean() + atr_multiplier * data['ATR']
+        data['Lower'] = data['Close'].rolling(window=atr_period).mean() - atr_multiplier * data['ATR']
+        data['Buy'] = (data['Close'] > data['Upper']) & (data['Close'].shift(1) <= data['Upper'].shift(1))
+        data['Sell'] = (data['Close'] < data['Lower']) & (data['Close'].shift(1) >= data['Lower'].shift(1))
+    elif indicator == "SMA Crossover":
+        data['SMA_Short'] = data['Close'].rolling(window=short_window).mean()
+        data['SMA_Long'] = data['Close'].rolling(window=long_window).mean()
+        data['Buy'] = (data['SMA_Short'] > data['SMA_Long']) & (data['SMA_Short'].shift(1) <= data['SMA_Long'].shift(1))
+        data['Sell'] = (data['SMA_Short'] < data['SMA_Long']) & (data['SMA_Short'].shift(1) >= data['SMA_Long'].shift(1))
+
+    # Backtesting
+    data['Position'] = np.nan
+    data.loc[data['Buy'], 'Position'] = 1
+    data.loc[data['Sell'], 'Position'] = 0
+    data['Position'] = data['Position'].ffill().fillna(0)
+    data['Strategy'] = data['Position'].shift(1) * data['Close'].pct_change()
+    data['Benchmark'] = data['Close'].pct_change()
+
+    # Calculate cumulative returns
+    data['Cum_Strategy'] = (1 + data['Strategy']).cumprod()
+    data['Cum_Benchmark'] = (1 + data['Benchmark']).cumprod()
 
 # Create interactive plot
-fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.05, 
-                    subplot_titles=("Stock Price", "Cumulative Returns", f"{indicator} Indicator"))
-
-# Stock price subplot
-fig.add_trace(go.Scatter(x=data.index, y=data['Close'], name="Close Price"), row=1, col=1)
-fig.add_trace(go.Scatter(x=data[data['Buy']].index, y=data[data['Buy']]['Close'], 
-                         mode='markers', name='Buy Signal', marker=dict(color='green', symbol='triangle-up', size=10)), row=1, col=1)
-fig.add_trace(go.Scatter(x=data[data['Sell']].index, y=data[data['Sell']]['Close'], 
-                         mode='markers', name='Sell Signal', marker=dict(color='red', symbol='triangle-down', size=10)), row=1, col=1)
-
-# Cumulative returns subplot
-fig.add_trace(go.Scatter(x=data.index, y=data['Cum_Strategy'], name="Strategy Returns"), row=2, col=1)
-fig.add_trace(go.Scatter(x=data.index, y=data['Cum_Benchmark'], name="Buy & Hold Returns"), row=2, col=1)
-
-# Indicator subplot
-if indicator == "MACD":
-    fig.add_trace(go.Scatter(x=data.index, y=data['MACD'], name="MACD"), row=3, col=1)
-    fig.add_trace(go.Scatter(x=data.index, y=data['Signal'], name="Signal"), row=3, col=1)
-elif indicator == "RSI":
-    fig.add_trace(go.Scatter(x=data.index, y=data['RSI'], name="RSI"), row=3, col=1)
-    fig.add_hline(y=overbought, line_dash="dash", line_color="red", row=3, col=1)
-    fig.add_hline(y=oversold, line_dash="dash", line_color="green", row=3, col=1)
-elif indicator == "ATR":
-    fig.add_trace(go.Scatter(x=data.index, y=data['Close'], name="Close"), row=3, col=1)
-    fig.add_trace(go.Scatter(x=data.index, y=data['Upper'], name="Upper Band"), row=3, col=1)
-    fig.add_trace(go.Scatter(x=data.index, y=data['Lower'], name="Lower Band"), row=3, col=1)
-elif indicator == "SMA Crossover":
-    fig.add_trace(go.Scatter(x=data.index, y=data['SMA_Short'], name="SMA Short"), row=3, col=1)
-    fig.add_trace(go.Scatter(x=data.index, y=data['SMA_Long'], name="SMA Long"), row=3, col=1)
-
-fig.update_layout(height=900, width=800, title_text=f"{ticker} Trading Strategy Backtest")
-st.plotly_chart(fig)
-
-# Calculate trade details
-trades = data[data['Position'] != data['Position'].shift(1)].copy()
-trades['Trade'] = trades['Position'].diff()
-trades = trades[trades['Trade'] != 0]
-trades['Holding Period'] = trades.index.to_series().diff().dt.days
-trades['Profit/Loss'] = trades['Close'] * trades['Trade'] * -1
-trades['Cumulative P/L'] = trades['Profit/Loss'].cumsum()
-
-# Display trade details table
-st.subheader("Trade Details")
-st.dataframe(trades[['Close', 'Trade', 'Holding Period', 'Profit/Loss', 'Cumulative P/L']])
-
-# Display performance metrics
-total_trades = len(trades)
-profitable_trades = (trades['Profit/Loss'] > 0).sum()
-win_rate = profitable_trades / total_trades if total_trades > 0 else 0
-average_profit = trades['Profit/Loss'].mean()
-total_return = trades['Profit/Loss'].sum()
-buy_hold_return = data['Close'].iloc[-1] / data['Close'].iloc[0] - 1
-
-st.subheader("Performance Metrics")
-col1, col2, col3 = st.columns(3)
-col1.metric("Total Trades", total_trades)
-col2.metric("Win Rate", f"{win_rate:.2%}")
-col3.metric("Average Profit/Loss", f"${average_profit:.2f}")
-
-col4, col5, col6 = st.columns(3)
-col4.metric("Total Return", f"${total_return:.2f}")
-col5.metric("Strategy Return", f"{(data['Cum_Strategy'].iloc[-1] - 1):.2%}")
-col6.metric("Buy & Hold Return", f"{buy_hold_return:.2%}")
+with timer.stage("figure"):
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.05, 
+                        subplot_titles=("Stock Price", "Cumulative Returns", f"{indicator} Indicator"))
+
+    # Stock price subplot
+    fig.add_trace(line_trace(data.index, data['Close'], name="Close Price"), row=1, col=1)
+    fig.add_trace(marker_trace(data[data['Buy']].index, data[data['Buy']]['Close'], name='Buy Signal', marker=dict(color='green', symbol='triangle-up', size=10)), row=1, col=1)
+    fig.add_trace(marker_trace(data[data['Sell']].index, data[data['Sell']]['Close'], name='Sell Signal', marker=dict(color='red', symbol='triangle-down', size=10)), row=1, col=1)
+
+    # Cumulative returns subplot
+    fig.add_trace(line_trace(data.index, data['Cum_Strategy'], name="Strategy Returns"), row=2, col=1)
+    fig.add_trace(line_trace(data.index, data['Cum_Benchmark'], name="Buy & Hold Returns"), row=2, col=1)
+
+    # Indicator subplot
+    if indicator == "MACD":
+        fig.add_trace(line_trace(data.index, data['MACD'], name="MACD"), row=3, col=1)
+        fig.add_trace(line_trace(data.index, data['Signal'], name="Signal"), row=3, col=1)
+    elif indicator == "RSI":
+        fig.add_trace(line_trace(data.index, data['RSI'], name="RSI"), row=3, col=1)
+        fig.add_hline(y=overbought, line_dash="dash", line_color="red", row=3, col=1)
+        fig.add_hline(y=oversold, line_dash="dash", line_color="green", row=3, col=1)
+    elif indicator == "ATR":
+        fig.add_trace(line_trace(data.index, data['Close'], name="Close"), row=3, col=1)
+        fig.add_trace(line_trace(data.index, data['Upper'], name="Upper Band"), row=3, col=1)
+        fig.add_trace(line_trace(data.index, data['Lower'], name="Lower Band"), row=3, col=1)
+    elif indicator == "SMA Crossover":
+        fig.add_trace(line_trace(data.index, data['SMA_Short'], name="SMA Short"), row=3, col=1)
+        fig.add_trace(line_trace(data.index, data['SMA_Long'], name="SMA Long"), row=3, col=1)
+
+    fig.update_layout(height=900, width=800, title_text=f"{ticker} Trading Strategy Backtest")
+with timer.stage("render"):
+    st.plotly_chart(fig)
+
+with timer.stage("trades"):
+    # Calculate trade details (closed round trips, P/L per share)
+    trades = extract_trades(data['Close'], data['Position'])
+
+    # Display trade details table
+    st.subheader("Trade Details")
+    st.dataframe(trades, hide_index=True)
+
+    # Display performance metrics
+    total_trades = len(trades)
+    # Win rate and average from each trade's return, so they don't depend on the share price
+    win_rate = (trades['Return'] > 0).mean() if total_trades > 0 else 0
+    average_return = trades['Return'].mean() if total_trades > 0 else 0
+    total_return = trades['Profit/Loss'].sum()
+    buy_hold_return = data['Close'].iloc[-1] / data['Close'].iloc[0] - 1
+
+    st.subheader("Performance Metrics")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Trades", total_trades)
+    col2.metric("Win Rate", f"{win_rate:.2%}")
+    col3.metric("Average Return per Trade", f"{average_return:.2%}")
+
+    col4, col5, col6 = st.columns(3)
+    col4.metric("Total Profit/Loss per Share", f"${total_return:.2f}")
+    col5.metric("Strategy Return", f"{(data['Cum_Strategy'].iloc[-1] - 1):.2%}")
+    col6.metric("Buy & Hold Return", f"{buy_hold_return:.2%}")
@@ -0,0 +1,373 @@
+"""
+Vectorized backtest engine for the indicator strategies in backtest.py.
+
+Indicators, signals, positions and returns are computed as 2D NumPy arrays of
+shape (time, parameter combinations), so a whole parameter grid is evaluated
+with array operations instead of one rerun per slider value. The indicator
+kernels reproduce the `ta` package definitions used by the single backtest
+(MACD/RSI exponential averages, Wilder ATR, simple moving averages).
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Parameter names per indicator, in the order used by backtest.py
+SWEEP_PARAMETERS = {
+    "MACD": ["fast_period", "slow_period", "signal_period"],
+    "RSI": ["rsi_period", "overbought", "oversold"],
+    "ATR": ["atr_period", "atr_multiplier"],
+    "SMA Crossover": ["short_window", "long_window"],
+}
+METRIC_COLUMNS = ['total_return', 'max_drawdown', 'win_rate', 'trades']
+CHUNK_SIZE = 500            # combinations per shard; bounds the (time x combos) arrays in memory
+PARALLEL_THRESHOLD = 4000   # grids smaller than this are cheaper to run in-process
+
+
+# --- Indicator kernels (columns are independent series) ---
+
+def ewm(values, alpha, min_periods):
+    """
+    Column-wise exponential average with adjust=False, like Series.ewm(..., adjust=False).mean().
+
+    `values` is (time, columns); `alpha` and `min_periods` are scalars or per-column arrays.
+    Leading NaNs are skipped, so each column starts at its first valid value.
+    """
+    values = np.asarray(values, dtype='float64')
+    alpha = np.broadcast_to(np.asarray(alpha, dtype='float64'), values.shape[1:])
+    decay = 1 - alpha
+    scaled = alpha * values
+    valid = ~np.isnan(values)
+    # Columns whose first valid value is at row t get (re)started there instead of decayed
+    first_valid = np.where(valid.any(axis=0), valid.argmax(axis=0), -1)
+    starts = {}
+    for column, row in enumerate(first_valid):
+        if row >= 0:
+            starts.setdefault(row, []).append(column)
+    out = np.empty_like(values)
+    previous = np.full(values.shape[1:], np.nan)
+    for t in range(len(values)):
+        previous *= decay
+        previous += scaled[t]
+        if t in starts:
+            previous[starts[t]] = values[t, starts[t]]
+        out[t] = previous
+    out[np.cumsum(valid, axis=0) < np.asarray(min_periods)] = np.nan
+    return out
+
+
+def ema(close, spans):
+    """EMA of a 1D price series for each span -> (time, len(spans))."""
+    spans = np.asarray(spans, dtype='float64')
+    values = np.repeat(np.asarray(close, dtype='float64')[:, None], len(spans), axis=1)
+    return ewm(values, 2.0 / (spans + 1.0), spans)
+
+
+def sma(close, windows):
+    """Simple moving average of a 1D series for each window -> (time, len(windows))."""
+    close = np.asarray(close, dtype='float64')
+    cumulative = np.concatenate([[0.0], np.cumsum(close)])
+    out = np.full((len(close), len(windows)), np.nan)
+    for j, window in enumerate(np.asarray(windows, dtype=int)):
+        if window <= len(close):
+            out[window - 1:, j] = (cumulative[window:] - cumulative[:-window]) / window
+    return out
+
+
+def rsi(close, periods):
+    """RSI (Wilder smoothing) for each period, as in ta.momentum.RSIIndicator."""
+    close = np.asarray(close, dtype='float64')
+    periods = np.asarray(periods, dtype='float64')
+    diff = np.diff(close, prepend=np.nan)
+    up = np.where(diff > 0, diff, 0.0)
+    down = np.where(diff < 0, -diff, 0.0)
+    ema_up = ewm(np.repeat(up[:, None], len(periods), axis=1), 1.0 / periods, periods)
+    ema_down = ewm(np.repeat(down[:, None], len(periods), axis=1), 1.0 / periods, periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(ema_down == 0, 100.0, 100.0 - 100.0 / (1.0 + ema_up / ema_down))
+
+
+def rolling_mean(values, window):
+    """Column-wise simple moving average of a (time, columns) array; NaN if the window has a gap."""
+    values = np.asarray(values, dtype='float64')
+    missing = np.isnan(values)
+    sums = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(np.where(missing, 0.0, values), axis=0)])
+    gaps = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(missing, axis=0)])
+    out = np.full(values.shape, np.nan)
+    if window <= len(values):
+        window_gaps = gaps[window:] - gaps[:-window]
+        out[window - 1:] = np.where(window_gaps == 0, (sums[window:] - sums[:-window]) / window, np.nan)
+    return out
+
+
+def wilder_average(values, periods):
+    """
+    Column-wise Wilder smoothing: the first value is the mean of the first `period` valid
+    values, then avg = (avg * (period - 1) + value) / period. NaN before warm-up.
+    """
+    values = np.asarray(values, dtype='float64')
+    periods = np.broadcast_to(np.asarray(periods, dtype='float64'), values.shape[1:])
+    valid = ~np.isnan(values)
+    first_valid = np.where(valid.any(axis=0), valid.argmax(axis=0), len(values))
+    seeds = {}
+    for column, (start, period) in enumerate(zip(first_valid, periods.astype(int))):
+        if start + period <= len(values):
+            seeds.setdefault(start + period - 1, []).append((column, values[start:start + period, column].mean()))
+    out = np.empty_like(values)
+    previous = np.full(values.shape[1:], np.nan)
+    for t in range(len(values)):
+        previous = (previous * (periods - 1) + values[t]) / periods
+        for column, seed in seeds.get(t, ()):
+            previous[column] = seed
+        out[t] = previous
+    return out
+
+
+def true_range_matrix(high, low, close):
+    """True range of (time, columns) price arrays; falls back to high - low without a previous close."""
+    high, low, close = (np.asarray(a, dtype='float64') for a in (high, low, close))
+    previous_close = np.concatenate([np.full((1,) + close.shape[1:], np.nan), close[:-1]])
+    return np.fmax(np.fmax(high - low, np.abs(high - previous_close)), np.abs(low - previous_close))
+
+
+def wilder_atr(high, low, close, periods):
+    """Average true range for each period, as in ta.volatility.AverageTrueRange (zeros before warm-up)."""
+    true_range = true_range_matrix(high, low, close)
+    periods = np.asarray(periods, dtype=int)
+    atr = wilder_average(np.repeat(true_range[:, None], len(periods), axis=1), periods)
+    return np.nan_to_num(atr, nan=0.0)
+
+
+# --- Signals, positions and metrics ---
+
+def _shift(values):
+    shifted = np.empty_like(values)
+    shifted[0] = np.nan
+    shifted[1:] = values[:-1]
+    return shifted
+
+
+def _cross_above(a, b):
+    return (a > b) & (_shift(a) <= _shift(b))
+
+
+def _cross_below(a, b):
+    return (a < b) & (_shift(a) >= _shift(b))
+
+
+def _unique_columns(values):
+    """Unique values and, for each input value, the column index into the unique array."""
+    unique, inverse = np.unique(np.asarray(values), return_inverse=True)
+    return unique, inverse
+
+
+def grid_signals(indicator, high, low, close, grid):
+    """Buy and sell crossover signals for every row of `grid` -> two (time, combos) bool arrays."""
+    close = np.asarray(close, dtype='float64')
+    if indicator == "MACD":
+        spans, inverse = _unique_columns(np.concatenate([grid['fast_period'], grid['slow_period']]))
+        emas = ema(close, spans)
+        fast_cols, slow_cols = inverse[:len(grid)], inverse[len(grid):]
+        macd = emas[:, fast_cols] - emas[:, slow_cols]
+        signal_spans = grid['signal_period'].to_numpy(dtype='float64')
+        signal = ewm(macd, 2.0 / (signal_spans + 1.0), signal_spans)
+        return _cross_above(macd, signal), _cross_below(macd, signal)
+    if indicator == "RSI":
+        periods, inverse = _unique_columns(grid['rsi_period'])
+        values = rsi(close, periods)[:, inverse]
+        oversold = grid['oversold'].to_numpy(dtype='float64')
+        overbought = grid['overbought'].to_numpy(dtype='float64')
+        previous = _shift(values)
+        return (values < oversold) & (previous >= oversold), (values > overbought) & (previous <= overbought)
+    if indicator == "ATR":
+        periods, inverse = _unique_columns(grid['atr_period'])
+        atr = wilder_atr(high, low, close, periods)[:, inverse]
+        mean = sma(close, periods)[:, inverse]
+        multiplier = grid['atr_multiplier'].to_numpy(dtype='float64')
+        upper = mean + multiplier * atr
+        lower = mean - multiplier * atr
+        closes = np.repeat(close[:, None], len(grid), axis=1)
+        return _cross_above(closes, upper), _cross_below(closes, lower)
+    if indicator == "SMA Crossover":
+        windows, inverse = _unique_columns(np.concatenate([grid['short_window'], grid['long_window']]))
+        averages = sma(close, windows)
+        short, long = averages[:, inverse[:len(grid)]], averages[:, inverse[len(grid):]]
+        return _cross_above(short, long), _cross_below(short, long)
+    raise ValueError(f"Unknown indicator: {indicator}")
+
+
+def matrix_signals(indicator, high, low, close, params):
+    """
+    Buy/sell signals and signal strength for one parameter set over a (time, tickers) price matrix.
+
+    Uses the same crossover rules as backtest.py. Strength is a non-negative-when-bullish
+    score used for signal-weighted allocation.
+    """
+    close = np.asarray(close, dtype='float64')
+    if indicator == "MACD":
+        fast = ewm(close, 2.0 / (params['fast_period'] + 1.0), params['fast_period'])
+        slow = ewm(close, 2.0 / (params['slow_period'] + 1.0), params['slow_period'])
+        macd = fast - slow
+        signal = ewm(macd, 2.0 / (params['signal_period'] + 1.0), params['signal_period'])
+        return _cross_above(macd, signal), _cross_below(macd, signal), (macd - signal) / close
+    if indicator == "RSI":
+        period = params['rsi_period']
+        diff = np.diff(close, axis=0, prepend=np.nan)
+        up = np.where(diff > 0, diff, 0.0)
+        down = np.where(diff < 0, -diff, 0.0)
+        # Before a ticker's first close there is no data; the first close itself counts as a 0 move
+        up[np.isnan(close)] = np.nan
+        down[np.isnan(close)] = np.nan
+        ema_up, ema_down = ewm(up, 1.0 / period, period), ewm(down, 1.0 / period, period)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(ema_down == 0, 100.0, 100.0 - 100.0 / (1.0 + ema_up / ema_down))
+        values[np.isnan(ema_down)] = np.nan
+        previous = _shift(values)
+        buy = (values < params['oversold']) & (previous >= params['oversold'])
+        sell = (values > params['overbought']) & (previous <= params['overbought'])
+        return buy, sell, (params['overbought'] - values) / 100.0
+    if indicator == "ATR":
+        period = params['atr_period']
+        atr = wilder_average(true_range_matrix(high, low, close), period)
+        mean = rolling_mean(close, period)
+        upper = mean + params['atr_multiplier'] * atr
+        lower = mean - params['atr_multiplier'] * atr
+        return _cross_above(close, upper), _cross_below(close, lower), (close - lower) / close
+    if indicator == "SMA Crossover":
+        short = rolling_mean(close, params['short_window'])
+        long = rolling_mean(close, params['long_window'])
+        return _cross_above(short, long), _cross_below(short, long), short / long - 1
+    raise ValueError(f"Unknown indicator: {indicator}")
+
+
+def positions_from_signals(buy, sell):
+    """Long/flat positions: 1 from a buy until the next sell (a sell wins on the same bar), else 0."""
+    # Encode (row, state) in one integer so a running max carries the latest event's state forward
+    rows = np.arange(len(buy))[:, None]
+    latest = np.maximum.accumulate(np.where(buy | sell, rows * 2 + (buy & ~sell), -1), axis=0)
+    return ((latest >= 0) & (latest % 2 == 1)).astype('float64')
+
+
+def evaluate_positions(close, positions):
+    """Total return, max drawdown, win rate and trade count for each positions column."""
+    close = np.asarray(close, dtype='float64')
+    returns = np.zeros(len(close))
+    returns[1:] = close[1:] / close[:-1] - 1
+    strategy = _shift(positions) * returns[:, None]
+    strategy[0] = 0.0
+    strategy = np.nan_to_num(strategy)
+    equity = np.cumprod(1 + strategy, axis=0)
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+
+    # Round trips: a long trade wins when the exit close is above the close at its entry
+    previous = _shift(positions)
+    previous[0] = 0.0
+    entries = (positions == 1) & (previous == 0)
+    exits = (positions == 0) & (previous == 1)
+    rows = np.arange(len(close))[:, None]
+    last_entry = np.maximum.accumulate(np.where(entries, rows, 0), axis=0)
+    wins = (exits & (close[:, None] > close[last_entry])).sum(axis=0)
+    closed = exits.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = np.where(closed > 0, wins / closed, np.nan)
+    return {
+        'total_return': equity[-1] - 1,
+        'max_drawdown': drawdown.min(axis=0),
+        'win_rate': win_rate,
+        'trades': entries.sum(axis=0),
+    }
+
+
+# --- Trade ledger ---
+
+TRADE_COLUMNS = ['Entry Date', 'Exit Date', 'Entry Price', 'Exit Price', 'Holding Period', 'Shares',
+                 'Profit/Loss', 'Return', 'Cumulative P/L']
+
+
+def extract_trades(close, positions, capital=None):
+    """
+    Round-trip trades from a long/flat position series, one row per closed trade.
+
+    A trade enters at the close of the first bar with position 1 and exits at the close of
+    the first bar back at 0; a position still open on the last bar is not listed. Each trade
+    holds one share, or `capital // entry price` whole shares when `capital` is given, so
+    Profit/Loss is per share by default. Return does not depend on the sizing. Holding Period
+    is in calendar days when the index is a DatetimeIndex, otherwise in bars.
+    """
+    index = close.index
+    prices = close.to_numpy(dtype='float64')
+    held = np.nan_to_num(np.asarray(positions, dtype='float64')) > 0
+    previous = np.concatenate([[False], held[:-1]])
+    exits = np.flatnonzero(~held & previous)
+    # Entries and exits alternate, so the k-th exit closes the k-th entry
+    entries = np.flatnonzero(held & ~previous)[:len(exits)]
+
+    entry_price, exit_price = prices[entries], prices[exits]
+    shares = np.ones_like(entry_price) if capital is None else capital // entry_price
+    profit = (exit_price - entry_price) * shares
+    if isinstance(index, pd.DatetimeIndex):
+        holding = (index[exits] - index[entries]).days
+    else:
+        holding = exits - entries
+    return pd.DataFrame({
+        'Entry Date': index[entries],
+        'Exit Date': index[exits],
+        'Entry Price': entry_price,
+        'Exit Price': exit_price,
+        'Holding Period': holding,
+        'Shares': shares,
+        'Profit/Loss': profit,
+        'Return': exit_price / entry_price - 1,
+        'Cumulative P/L': np.cumsum(profit),
+    }, columns=TRADE_COLUMNS)
+
+
+# --- Sweep driver ---
+
+def parameter_grid(parameter_values):
+    """Cartesian product of {name: values} as a DataFrame with one row per combination."""
+    names = list(parameter_values)
+    return pd.DataFrame(list(itertools.product(*(parameter_values[name] for name in names))), columns=names)
+
+
+def _valid_combinations(indicator, grid):
+    """Drops combinations where the fast/short average is not shorter than the slow/long one."""
+    if indicator == "MACD":
+        grid = grid[grid['fast_period'] < grid['slow_period']]
+    elif indicator == "SMA Crossover":
+        grid = grid[grid['short_window'] < grid['long_window']]
+    return grid.reset_index(drop=True)
+
+
+def _evaluate_chunk(args):
+    indicator, high, low, close, grid = args
+    buy, sell = grid_signals(indicator, high, low, close, grid)
+    metrics = evaluate_positions(close, positions_from_signals(buy, sell))
+    return grid.assign(**metrics)
+
+
+def run_sweep(data, indicator, parameter_values, chunk_size=CHUNK_SIZE, max_workers=None,
+              parallel_threshold=PARALLEL_THRESHOLD):
+    """
+    Backtests every parameter combination of `indicator` on an OHLC DataFrame.
+
+    The grid is split into shards of `chunk_size` combinations. Large grids are spread over
+    a process pool; small ones run in-process. Returns one row per combination with
+    total_return, max_drawdown, win_rate and trades, best total return first (no rows when
+    the ranges leave no valid combination).
+    """
+    grid = _valid_combinations(indicator, parameter_grid(parameter_values))
+    if grid.empty:
+        return grid.reindex(columns=list(grid.columns) + METRIC_COLUMNS)
+    high, low, close = (data[col].to_numpy(dtype='float64') for col in ('High', 'Low', 'Close'))
+    shards = [(indicator, high, low, close, grid.iloc[start:start + chunk_size].reset_index(drop=True))
+              for start in range(0, len(grid), chunk_size)]
+    if len(grid) >= parallel_threshold and (os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_evaluate_chunk, shards))
+    else:
+        results = [_evaluate_chunk(shard) for shard in shards]
+    return pd.concat(results, ignore_index=True).sort_values('total_return', ascending=False, ignore_index=True)
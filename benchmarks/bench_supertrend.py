@@ -0,0 +1,115 @@
+"""
+SuperTrend kernel benchmark and equivalence check.
+
+Compares indicators.supertrend_bands against the original per-row pandas
+implementation from alpaca_supertrend.py (kept below as the reference), then
+times both at several sizes.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_supertrend
+    python -m benchmarks.bench_supertrend --sizes 1000 100000 1000000 --legacy-max 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_ohlcv
+from indicators import supertrend_bands
+
+PERIOD = 7
+MULTIPLIER = 3
+
+
+# --- Reference implementation (alpaca_supertrend.py before the NumPy kernel) ---
+
+def legacy_tr(data):
+    data = data.copy(); data['previous_close'] = data['Close'].shift(1)
+    data['high-low'] = abs(data['High'] - data['Low'])
+    data['high-pc'] = abs(data['High'] - data['previous_close'])
+    data['low-pc'] = abs(data['Low'] - data['previous_close'])
+    return data[['high-low', 'high-pc', 'low-pc']].max(axis=1)
+
+
+def legacy_atr(data, period):
+    data = data.copy(); data['tr'] = legacy_tr(data)
+    data.dropna(subset=['tr'], inplace=True)
+    if data.empty or len(data) < period: return None
+    return data['tr'].rolling(period).mean()
+
+
+def legacy_supertrend(df, period=PERIOD, atr_multiplier=MULTIPLIER):
+    df = df.copy(); df['atr'] = legacy_atr(df, period)
+    df.dropna(subset=['atr'], inplace=True)
+    hl2 = (df['High'] + df['Low']) / 2
+    df['upperband'] = hl2 + (atr_multiplier * df['atr'])
+    df['lowerband'] = hl2 - (atr_multiplier * df['atr'])
+    df['in_uptrend'] = True
+    for current in range(1, len(df.index)):
+        previous = current - 1; idx_current = df.index[current]; idx_previous = df.index[previous]
+        close_current = df.loc[idx_current, 'Close']; upperband_prev = df.loc[idx_previous, 'upperband']
+        lowerband_prev = df.loc[idx_previous, 'lowerband']; lowerband_current = df.loc[idx_current, 'lowerband']
+        upperband_current = df.loc[idx_current, 'upperband']; in_uptrend_prev = df.loc[idx_previous, 'in_uptrend']
+        if close_current > upperband_prev: df.loc[idx_current, 'in_uptrend'] = True
+        elif close_current < lowerband_prev: df.loc[idx_current, 'in_uptrend'] = False
+        else:
+            df.loc[idx_current, 'in_uptrend'] = in_uptrend_prev
+            if df.loc[idx_current, 'in_uptrend'] and lowerband_current < lowerband_prev: df.loc[idx_current, 'lowerband'] = lowerband_prev
+            if not df.loc[idx_current, 'in_uptrend'] and upperband_current > upperband_prev: df.loc[idx_current, 'upperband'] = upperband_prev
+    return df
+
+
+def kernel_supertrend(df, period=PERIOD, atr_multiplier=MULTIPLIER):
+    """The same adapter supertrend_bot.supertrend uses, without importing alpaca_trade_api."""
+    atr, upperband, lowerband, in_uptrend = supertrend_bands(df['High'], df['Low'], df['Close'], period, atr_multiplier)
+    df = df.copy()
+    df['atr'] = atr; df['upperband'] = upperband; df['lowerband'] = lowerband; df['in_uptrend'] = in_uptrend
+    return df.iloc[period - 1:]
+
+
+def check_equivalence(n_bars, seed):
+    """Raises AssertionError if the kernel and the reference disagree on any output column."""
+    data = synthetic_ohlcv(n_bars, seed=seed)
+    expected = legacy_supertrend(data)
+    actual = kernel_supertrend(data)
+    assert expected.index.equals(actual.index), "index mismatch"
+    for col in ['atr', 'upperband', 'lowerband']:
+        np.testing.assert_allclose(actual[col].values, expected[col].values, rtol=1e-12, err_msg=col)
+    assert (actual['in_uptrend'].values == expected['in_uptrend'].values.astype(bool)).all(), "in_uptrend mismatch"
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--legacy-max', type=int, default=100_000,
+                        help="largest size to time the reference loop at (it is slow)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for seed in range(5):
+        check_equivalence(2_000, seed)
+    print("Equivalence: kernel matches the reference on 5 random series of 2,000 bars")
+
+    rows = []
+    for n_bars in args.sizes:
+        data = synthetic_ohlcv(n_bars)
+        kernel_seconds = best_of(lambda: kernel_supertrend(data), args.repeat)
+        legacy_seconds = best_of(lambda: legacy_supertrend(data), 1) if n_bars <= args.legacy_max else np.nan
+        rows.append({'bars': n_bars, 'legacy_s': legacy_seconds, 'kernel_s': kernel_seconds,
+                     'speedup': legacy_seconds / kernel_seconds})
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f"{v:,.4f}"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+Benchmark suite for the project's compute hot paths.
+
+Times each case at several sizes on deterministic synthetic inputs (no network),
+measures peak Python memory with tracemalloc, appends the run to a JSON Lines
+history and flags regressions against a stored baseline.
+
+Cases:
+    supertrend.*     the indicators.py kernels behind supertrend_bot: bands / atr / tr over whole
+                     arrays, and StreamingSuperTrend.update bar by bar (the live bot's path)
+    backtest.*       the signal -> position -> metrics pipeline of backtest.py, single run and sweep
+    trades           the trade ledger built by backtest.py / backtest_default.py
+    rolling_fit      the window loop of rolling_piecewise_fit.py (uncached, in-process)
+    options.*        option values: chain IV + Greeks, and the strategy scenario grid
+
+Usage (from the repository root):
+    python -m benchmarks.suite                     # run, record, compare with the baseline
+    python -m benchmarks.suite --save-baseline     # ... and make this run the new baseline
+    python -m benchmarks.suite --quick --cases supertrend backtest
+Exits with status 1 when a case is slower (or uses more memory) than the baseline
+by more than --tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_ohlcv
+
+RESULTS_DIR = os.environ.get("BENCHMARK_RESULTS_DIR", os.path.join(".cache", "benchmarks"))
+HISTORY_FILE = "history.jsonl"
+BASELINE_FILE = "baseline.json"
+TOLERANCE = 0.25   # fractional slowdown (or memory growth) reported as a regression
+MIN_SECONDS = 1e-3  # cases faster than this are too noisy to flag
+SUPERTREND_PERIOD = 7      # the live bot's settings (supertrend_bot.py)
+SUPERTREND_MULTIPLIER = 3
+
+
+# --- Cases: each takes a size and returns a zero-argument callable to time ---
+
+def _ohlc_arrays(n_bars):
+    data = synthetic_ohlcv(n_bars)
+    return data['High'].to_numpy(), data['Low'].to_numpy(), data['Close'].to_numpy()
+
+
+def supertrend_case(n_bars):
+    from indicators import supertrend_bands
+    high, low, close = _ohlc_arrays(n_bars)
+    return lambda: supertrend_bands(high, low, close, SUPERTREND_PERIOD, SUPERTREND_MULTIPLIER)
+
+
+def atr_case(n_bars):
+    from indicators import average_true_range
+    high, low, close = _ohlc_arrays(n_bars)
+    return lambda: average_true_range(high, low, close, SUPERTREND_PERIOD)
+
+
+def tr_case(n_bars):
+    from indicators import true_range
+    high, low, close = _ohlc_arrays(n_bars)
+    return lambda: true_range(high, low, close)
+
+
+def streaming_case(n_bars):
+    from indicators import StreamingSuperTrend
+    bars = list(zip(range(n_bars), *(values.tolist() for values in _ohlc_arrays(n_bars))))
+
+    def run():
+        indicator = StreamingSuperTrend(SUPERTREND_PERIOD, SUPERTREND_MULTIPLIER)
+        for timestamp, high, low, close in bars:
+            indicator.update(timestamp, high, low, close)
+    return run
+
+
+def backtest_single_case(n_bars):
+    from backtest_engine import evaluate_positions, matrix_signals, positions_from_signals
+    data = synthetic_ohlcv(n_bars, freq='D')
+    high, low, close = (data[[col]].to_numpy() for col in ('High', 'Low', 'Close'))
+    params = {
+        "MACD": {'fast_period': 12, 'slow_period': 26, 'signal_period': 9},
+        "RSI": {'rsi_period': 14, 'oversold': 30, 'overbought': 70},
+        "ATR": {'atr_period': 14, 'atr_multiplier': 2.0},
+        "SMA Crossover": {'short_window': 20, 'long_window': 50},
+    }
+
+    def run():
+        for indicator, values in params.items():
+            buy, sell, _ = matrix_signals(indicator, high, low, close, values)
+            evaluate_positions(close[:, 0], positions_from_signals(buy, sell))
+    return run
+
+
+def backtest_sweep_case(n_bars):
+    from backtest_engine import run_sweep
+    data = synthetic_ohlcv(n_bars, freq='D')
+    values = {'fast_period': range(5, 21), 'slow_period': range(20, 51, 2), 'signal_period': range(5, 13)}
+    # In-process, so the timing measures the kernels rather than process start-up
+    return lambda: run_sweep(data, "MACD", values, parallel_threshold=np.inf)
+
+
+def trades_case(n_bars):
+    from backtest_engine import extract_trades
+    data = synthetic_ohlcv(n_bars, freq='D')
+    # SMA-above-SMA long/flat signal, as backtest_default.py builds it
+    close = data['Close']
+    signal = pd.Series(np.where(close.rolling(20).mean() > close.rolling(50).mean(), 1, 0), index=data.index)
+    return lambda: extract_trades(close, signal, capital=1000)
+
+
+def rolling_fit_case(n_points):
+    from segmentation import fit_windows
+    close = synthetic_ohlcv(n_points, freq='D')['Close'].to_numpy()
+    x = np.arange(n_points, dtype='float64')
+    # The largest window and segment count rolling_piecewise_fit.py offers
+    return lambda: fit_windows(x, close, 21, 3, "exact", cache_path=None, parallel_threshold=np.inf)
+
+
+def _synthetic_chain(n_strikes, spot=100.0, seed=42):
+    from black_scholes import bs_price
+    rng = np.random.default_rng(seed)
+    strike = np.linspace(0.5 * spot, 1.5 * spot, n_strikes)
+    iv = 0.25 + 0.3 * (strike / spot - 1) ** 2
+    fair = bs_price(spot, strike, 30 / 365, 0.04, iv, True)
+    half_spread = np.maximum(0.01, fair * rng.uniform(0.01, 0.05, n_strikes))
+    return pd.DataFrame({'strike': strike, 'bid': np.maximum(fair - half_spread, 0.0), 'ask': fair + half_spread})
+
+
+def chain_greeks_case(n_strikes):
+    from black_scholes import chain_greeks
+    chain = _synthetic_chain(n_strikes)
+    expiration = (pd.Timestamp.now().normalize() + pd.Timedelta(days=30)).strftime('%Y-%m-%d')
+    return lambda: chain_greeks(chain, 100.0, expiration, True)
+
+
+def scenario_grid_case(n_spots):
+    from strategy_payoff import scenario_pnl
+    legs = [
+        {'type': 'put', 'strike': 90.0, 'quantity': 1, 'premium': 1.2, 'iv': 0.3, 'tenor': 45 / 365},
+        {'type': 'put', 'strike': 95.0, 'quantity': -1, 'premium': 2.1, 'iv': 0.28, 'tenor': 45 / 365},
+        {'type': 'call', 'strike': 105.0, 'quantity': -1, 'premium': 2.0, 'iv': 0.26, 'tenor': 45 / 365},
+        {'type': 'call', 'strike': 110.0, 'quantity': 1, 'premium': 1.1, 'iv': 0.27, 'tenor': 45 / 365},
+    ]
+    spots = np.linspace(70, 130, n_spots)
+    days = np.arange(0, 46)
+    shifts = np.linspace(-0.1, 0.1, 9)
+    return lambda: scenario_pnl(legs, spots, days, shifts)
+
+
+# name -> (case, sizes, quick sizes)
+CASES = {
+    'supertrend.bands': (supertrend_case, [1_000, 100_000, 1_000_000], [1_000, 100_000]),
+    'supertrend.atr': (atr_case, [1_000, 100_000, 1_000_000], [1_000, 100_000]),
+    'supertrend.tr': (tr_case, [1_000, 100_000, 1_000_000], [1_000, 100_000]),
+    'supertrend.streaming': (streaming_case, [1_000, 100_000, 1_000_000], [1_000, 100_000]),
+    'backtest.single': (backtest_single_case, [1_000, 10_000, 100_000], [1_000, 10_000]),
+    'backtest.sweep': (backtest_sweep_case, [1_000, 5_000], [1_000]),
+    'trades': (trades_case, [1_000, 100_000, 1_000_000], [1_000, 100_000]),
+    'rolling_fit': (rolling_fit_case, [250, 1_000], [250]),
+    'options.chain_greeks': (chain_greeks_case, [100, 10_000, 1_000_000], [100, 10_000]),
+    'options.scenario_grid': (scenario_grid_case, [50, 200, 1_000], [50, 200]),
+}
+
+
+# --- Measurement ---
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def peak_memory(func):
+    """Peak bytes allocated through Python's allocators during one call (NumPy buffers included)."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_cases(names, quick=False, repeat=5):
+    results = []
+    for name in names:
+        case, sizes, quick_sizes = CASES[name]
+        for size in (quick_sizes if quick else sizes):
+            try:
+                func = case(size)
+            except ImportError as e:
+                print(f"{name}: skipped ({e})")
+                break
+            func()  # warm-up: imports, caches, first-call allocation
+            results.append({'case': name, 'size': size, 'seconds': best_of(func, repeat),
+                            'peak_mb': peak_memory(func) / 2**20})
+    return results
+
+
+# --- History and baseline ---
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_record(results):
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+
+
+def append_history(record, results_dir=RESULTS_DIR):
+    os.makedirs(results_dir, exist_ok=True)
+    with open(os.path.join(results_dir, HISTORY_FILE), 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def load_baseline(results_dir=RESULTS_DIR):
+    path = os.path.join(results_dir, BASELINE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(record, results_dir=RESULTS_DIR):
+    os.makedirs(results_dir, exist_ok=True)
+    with open(os.path.join(results_dir, BASELINE_FILE), 'w') as f:
+        json.dump(record, f, indent=2)
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Results as a DataFrame with baseline ratios and a regression flag per row."""
+    table = pd.DataFrame(results, columns=['case', 'size', 'seconds', 'peak_mb'])
+    if baseline is None:
+        return table.assign(time_ratio=np.nan, memory_ratio=np.nan, regression=False)
+    base = pd.DataFrame(baseline['results'], columns=['case', 'size', 'seconds', 'peak_mb'])
+    table = table.merge(base, on=['case', 'size'], how='left', suffixes=('', '_baseline'))
+    table['time_ratio'] = table['seconds'] / table['seconds_baseline']
+    table['memory_ratio'] = table['peak_mb'] / table['peak_mb_baseline']
+    slower = (table['time_ratio'] > 1 + tolerance) & (table['seconds'] >= MIN_SECONDS)
+    larger = table['memory_ratio'] > 1 + tolerance
+    table['regression'] = slower | larger
+    return table.drop(columns=['seconds_baseline', 'peak_mb_baseline'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', nargs='+', help="case names or prefixes (default: all)")
+    parser.add_argument('--quick', action='store_true', help="smaller sizes only")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    names = [name for name in CASES
+             if not args.cases or any(name == c or name.startswith(c + '.') for c in args.cases)]
+    results = run_cases(names, args.quick, args.repeat)
+    record = run_record(results)
+    append_history(record, args.results_dir)
+
+    table = compare(results, load_baseline(args.results_dir), args.tolerance)
+    print(table.to_string(index=False, float_format=lambda v: f"{v:,.4f}"))
+    if args.save_baseline:
+        save_baseline(record, args.results_dir)
+        print(f"Saved as baseline in {args.results_dir}")
+    elif table['regression'].any():
+        print(f"REGRESSION: {int(table['regression'].sum())} case(s) beyond {args.tolerance:.0%} of the baseline")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
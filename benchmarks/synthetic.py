@@ -0,0 +1,25 @@
+"""
+Deterministic synthetic market data for the benchmarks.
+
+Everything is generated from a fixed seed, so repeated runs time exactly the
+same inputs and no network access is needed.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_ohlcv(n_bars, freq="1min", start="2024-01-01", seed=42, start_price=50000.0):
+    """Geometric random walk with consistent Open/High/Low/Close/Volume columns."""
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(0.0, 0.001, n_bars)
+    close = start_price * np.exp(np.cumsum(log_returns))
+    open_ = np.empty_like(close)
+    open_[0] = start_price
+    open_[1:] = close[:-1]
+    spread = np.abs(rng.normal(0.0, 0.0008, n_bars)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.integers(1, 1000, n_bars).astype('float64')
+    index = pd.date_range(start, periods=n_bars, freq=freq, name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
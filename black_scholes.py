@@ -0,0 +1,167 @@
+"""
+Vectorized Black-Scholes pricing, implied volatility and Greeks for option chains.
+
+Every function takes NumPy arrays (or scalars that broadcast against them), so a
+whole chain is priced and solved in a handful of array operations. The implied
+volatility solver runs Newton steps on all strikes at once, falling back to
+bisection inside a per-strike bracket wherever a Newton step would leave it, so
+it converges even for deep in/out-of-the-money strikes where vega is tiny.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+RISK_FREE_RATE = 0.04
+IV_LOWER = 1e-4
+IV_UPPER = 5.0
+IV_TOLERANCE = 1e-8
+IV_MAX_ITERATIONS = 100
+
+
+def _norm_pdf(x):
+    return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+
+def _d1_d2(spot, strike, t, rate, vol, dividend):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol_sqrt_t = vol * np.sqrt(t)
+        d1 = (np.log(spot / strike) + (rate - dividend + 0.5 * vol * vol) * t) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+
+def bs_price(spot, strike, t, rate, vol, is_call, dividend=0.0):
+    """Black-Scholes price of European calls (is_call True) or puts, with continuous dividend yield."""
+    d1, d2 = _d1_d2(spot, strike, t, rate, vol, dividend)
+    spot_df = spot * np.exp(-dividend * t)
+    strike_df = strike * np.exp(-rate * t)
+    call = spot_df * ndtr(d1) - strike_df * ndtr(d2)
+    put = strike_df * ndtr(-d2) - spot_df * ndtr(-d1)
+    return np.where(is_call, call, put)
+
+
+def _vega(spot, strike, t, rate, vol, dividend):
+    d1, _ = _d1_d2(spot, strike, t, rate, vol, dividend)
+    return spot * np.exp(-dividend * t) * _norm_pdf(d1) * np.sqrt(t)
+
+
+def price_bounds(spot, strike, t, rate, is_call, dividend=0.0):
+    """No-arbitrage (lower, upper) bounds on a European option price."""
+    spot_df = spot * np.exp(-dividend * t)
+    strike_df = strike * np.exp(-rate * t)
+    lower = np.where(is_call, np.maximum(spot_df - strike_df, 0.0), np.maximum(strike_df - spot_df, 0.0))
+    upper = np.where(is_call, spot_df, strike_df)
+    return lower, upper
+
+
+def implied_volatility(price, spot, strike, t, rate, is_call, dividend=0.0, tolerance=IV_TOLERANCE,
+                       max_iterations=IV_MAX_ITERATIONS):
+    """
+    Implied volatility for every option at once; NaN where none exists.
+
+    Prices outside the no-arbitrage bounds, non-positive times to expiry and missing prices
+    have no implied volatility. The rest are solved to `tolerance` in price.
+    """
+    price, spot, strike, t, is_call = np.broadcast_arrays(
+        np.asarray(price, dtype='float64'), np.asarray(spot, dtype='float64'),
+        np.asarray(strike, dtype='float64'), np.asarray(t, dtype='float64'), np.asarray(is_call, dtype=bool))
+    lower_bound, upper_bound = price_bounds(spot, strike, t, rate, is_call, dividend)
+    valid = np.isfinite(price) & (t > 0) & (strike > 0) & (price > lower_bound) & (price < upper_bound)
+
+    low = np.full(price.shape, IV_LOWER)
+    high = np.full(price.shape, IV_UPPER)
+    # Start from the Brenner-Subrahmanyam at-the-money approximation
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol = np.sqrt(2 * np.pi / t) * price / spot
+    vol = np.where(np.isfinite(vol), np.clip(vol, 0.05, 2.0), 0.3)
+    active = valid.copy()
+    for _ in range(max_iterations):
+        if not active.any():
+            break
+        model = bs_price(spot[active], strike[active], t[active], rate, vol[active], is_call[active], dividend)
+        diff = model - price[active]
+        # Price increases with vol, so the sign of the error tightens the bracket
+        too_high = diff > 0
+        high[active] = np.where(too_high, vol[active], high[active])
+        low[active] = np.where(too_high, low[active], vol[active])
+
+        vega = _vega(spot[active], strike[active], t[active], rate, vol[active], dividend)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            newton = vol[active] - diff / vega
+        inside = np.isfinite(newton) & (newton > low[active]) & (newton < high[active])
+        step = np.where(inside, newton, 0.5 * (low[active] + high[active]))
+
+        converged = np.abs(diff) < tolerance
+        vol[active] = np.where(converged, vol[active], step)
+        still_active = np.flatnonzero(active)[~converged & (high[active] - low[active] > tolerance)]
+        active[:] = False
+        active[still_active] = True
+    return np.where(valid, vol, np.nan)
+
+
+def greeks(spot, strike, t, rate, vol, is_call, dividend=0.0):
+    """
+    Delta, gamma, theta, vega and rho as a dict of arrays.
+
+    Theta is per calendar day, vega per 1 volatility point and rho per 1% change in rates.
+    """
+    d1, d2 = _d1_d2(spot, strike, t, rate, vol, dividend)
+    spot_df = spot * np.exp(-dividend * t)
+    strike_df = strike * np.exp(-rate * t)
+    pdf = _norm_pdf(d1)
+    sqrt_t = np.sqrt(t)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = np.exp(-dividend * t) * pdf / (spot * vol * sqrt_t)
+        decay = -spot_df * pdf * vol / (2 * sqrt_t)
+    call_theta = decay - rate * strike_df * ndtr(d2) + dividend * spot_df * ndtr(d1)
+    put_theta = decay + rate * strike_df * ndtr(-d2) - dividend * spot_df * ndtr(-d1)
+    return {
+        'delta': np.where(is_call, np.exp(-dividend * t) * ndtr(d1), -np.exp(-dividend * t) * ndtr(-d1)),
+        'gamma': gamma,
+        'theta': np.where(is_call, call_theta, put_theta) / 365,
+        'vega': spot_df * pdf * sqrt_t / 100,
+        'rho': np.where(is_call, strike_df * t * ndtr(d2), -strike_df * t * ndtr(-d2)) / 100,
+    }
+
+
+def quote_mid(bid, ask):
+    """
+    Mid prices with a status per quote; the mid is NaN unless the quote is usable.
+
+    A quote is unusable when the bid is missing or zero (no real market), the ask is missing
+    or zero, or the market is crossed (bid above ask).
+    """
+    bid = np.asarray(bid, dtype='float64')
+    ask = np.asarray(ask, dtype='float64')
+    status = np.full(bid.shape, 'ok', dtype=object)
+    status[~(ask > 0)] = 'no ask'
+    status[~(bid > 0)] = 'zero bid'
+    status[(bid > 0) & (ask > 0) & (bid > ask)] = 'crossed'
+    mid = np.where(status == 'ok', (bid + ask) / 2, np.nan)
+    return mid, status
+
+
+def time_to_expiry(expiration, now=None):
+    """Years from `now` to 16:00 on the expiration date (0 once expired)."""
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    expiry = pd.Timestamp(expiration) + pd.Timedelta(hours=16)
+    return max((expiry - now).total_seconds(), 0.0) / (365 * 24 * 3600)
+
+
+def chain_greeks(chain, spot, expiration, is_call, rate=RISK_FREE_RATE, dividend=0.0, now=None):
+    """
+    Adds mid, quote_status, iv, delta, gamma, theta, vega and rho columns to a yfinance chain.
+
+    Greeks are NaN for strikes without a usable quote or implied volatility.
+    """
+    chain = chain.copy()
+    strike = chain['strike'].to_numpy(dtype='float64')
+    t = time_to_expiry(expiration, now)
+    mid, status = quote_mid(chain['bid'], chain['ask'])
+    iv = implied_volatility(mid, spot, strike, t, rate, is_call, dividend)
+    chain['mid'] = mid
+    chain['quote_status'] = status
+    chain['iv'] = iv
+    for name, values in greeks(spot, strike, t, rate, iv, is_call, dividend).items():
+        chain[name] = values
+    return chain
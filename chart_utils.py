@@ -0,0 +1,104 @@
+"""
+Plotly helpers that keep large time series cheap to send and render.
+
+Line traces are downsampled on the server to a pixel budget with MinMaxLTTB:
+per-bin minima and maxima are preselected (so spikes always survive), then
+Largest-Triangle-Three-Buckets picks the visually most significant points
+among them. Marker traces (trade signals, threshold hits) are never
+downsampled. Traces that still carry more than WEBGL_THRESHOLD points are
+drawn with Scattergl.
+
+Streamlit does not send Plotly zoom events back to the script, so a trace
+cannot be re-downsampled for the zoomed range; pick a tighter date range in
+the app to see full detail.
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+MAX_POINTS = 2000        # roughly the pixel width of a wide chart
+MINMAX_RATIO = 4         # candidates preselected per output point
+WEBGL_THRESHOLD = 5000
+
+
+def _numeric_x(x):
+    x = pd.Index(x)
+    if isinstance(x, pd.DatetimeIndex):
+        return x.asi8.astype('float64')
+    if pd.api.types.is_numeric_dtype(x):
+        return x.to_numpy(dtype='float64')
+    return np.arange(len(x), dtype='float64')
+
+
+def minmax_indices(y, n_bins):
+    """Indices of the minimum and maximum of y in each of n_bins equal-width (in points) bins."""
+    bin_size = -(-len(y) // n_bins)
+    # Pad with the last value so the bins fill a rectangle; padded positions map back to the last point
+    padded = np.pad(y, (0, bin_size * n_bins - len(y)), mode='edge').reshape(n_bins, bin_size)
+    offsets = np.arange(n_bins) * bin_size
+    lows = offsets + padded.argmin(axis=1)
+    highs = offsets + padded.argmax(axis=1)
+    return np.unique(np.minimum(np.concatenate([lows, highs]), len(y) - 1))
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of n_out points that best preserve the line's shape."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket (or the last point) is the triangle's third vertex
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_indices(x, y, max_points=MAX_POINTS, minmax_ratio=MINMAX_RATIO):
+    """Indices of at most max_points finite points chosen with MinMaxLTTB."""
+    x = _numeric_x(x)
+    y = np.asarray(y, dtype='float64')
+    finite = np.flatnonzero(np.isfinite(y))
+    if len(finite) <= max_points:
+        return finite
+    candidates = finite[minmax_indices(y[finite], max_points * minmax_ratio // 2)]
+    candidates = np.unique(np.concatenate([[finite[0]], candidates, [finite[-1]]]))
+    return candidates[lttb_indices(x[candidates], y[candidates], max_points)]
+
+
+def _trace_class(n_points):
+    return go.Scattergl if n_points > WEBGL_THRESHOLD else go.Scatter
+
+
+def line_trace(x, y, max_points=MAX_POINTS, **kwargs):
+    """A line trace downsampled to max_points (pass max_points=None to send every point)."""
+    x = pd.Index(x)
+    y = np.asarray(y, dtype='float64')
+    if max_points is not None:
+        keep = downsample_indices(x, y, max_points)
+        x, y = x[keep], y[keep]
+    kwargs.setdefault('mode', 'lines')
+    return _trace_class(len(x))(x=x, y=y, **kwargs)
+
+
+def marker_trace(x, y, **kwargs):
+    """A marker trace with every point kept exactly (signals must not be dropped or moved)."""
+    kwargs.setdefault('mode', 'markers')
+    return _trace_class(len(x))(x=x, y=y, **kwargs)
+
+
+def histogram_trace(values, nbins=50, **kwargs):
+    """A histogram binned on the server, so only the bin counts are sent to the browser."""
+    values = np.asarray(values, dtype='float64')
+    counts, edges = np.histogram(values[np.isfinite(values)], bins=nbins)
+    return go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), **kwargs)
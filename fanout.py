@@ -0,0 +1,55 @@
+"""
+Concurrent fan-out of independent slow calls, each with its own timeout.
+
+fan_out() starts every call at once on its own thread and yields the outcomes in
+completion order, so a page can fill each section as soon as its data arrives.
+The page then waits for the slowest call, not the sum of all of them.
+
+A call still running at its deadline is reported as a TimeoutError and abandoned.
+Python threads cannot be killed, so it finishes in the background. Without a cache its
+result is discarded. Successful results can be kept in a ttl_cache.TTLCache, so reruns
+within the TTL skip the network. Failures are never cached. With a cache, a call that
+outlives its deadline still stores its result when it finishes, and until then later
+fan-outs wait on that same call instead of starting another thread, so a hung source
+holds at most one thread.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_TIMEOUT_SECONDS = 10
+
+
+def fan_out(calls, timeouts=None, default_timeout=DEFAULT_TIMEOUT_SECONDS, cache=None):
+    """
+    Runs `calls` ({name: zero-argument callable}) concurrently.
+
+    Yields (name, result, error, seconds) as each call finishes or times out; `error` is
+    None on success. With a `cache`, results are looked up and stored under their name, and a
+    name whose previous load is still running shares that load.
+    """
+    timeouts = timeouts or {}
+    executor = ThreadPoolExecutor(max_workers=max(1, len(calls)), thread_name_prefix='fan-out')
+    started = time.perf_counter()
+    names, deadlines = {}, {}
+    for name, call in calls.items():
+        future = executor.submit(call) if cache is None else cache.get_future(name, call, executor.submit)
+        names[future] = name
+        deadlines[future] = started + timeouts.get(name, default_timeout)
+    try:
+        pending = set(names)
+        while pending:
+            next_deadline = min(deadlines[future] for future in pending)
+            done, pending = wait(pending, timeout=max(0.0, next_deadline - time.perf_counter()),
+                                 return_when=FIRST_COMPLETED)
+            now = time.perf_counter()
+            for future in done:
+                error = future.exception()
+                yield names[future], None if error else future.result(), error, now - started
+            for future in [future for future in pending if deadlines[future] <= now]:
+                pending.discard(future)
+                timeout = timeouts.get(names[future], default_timeout)
+                yield names[future], None, TimeoutError(f"no response within {timeout:g}s"), now - started
+    finally:
+        # Don't wait for abandoned calls (there is a worker per call, so every call has started)
+        executor.shutdown(wait=False)
@@ -0,0 +1,50 @@
+"""
+On-demand indicator registry for backtest_default.py.
+
+Each entry computes a single indicator, with the parameters picked in the
+sidebar, through the matching `ta` class. Only the selected indicator is
+computed, rather than every `ta` feature at its default window, and callers
+can memoize a result on (ticker, date range, indicator, params).
+"""
+
+import pandas as pd
+from ta.momentum import RSIIndicator
+from ta.trend import MACD, SMAIndicator
+from ta.volatility import AverageTrueRange
+
+
+def _sma_crossover(data, short_window, long_window):
+    return pd.DataFrame({
+        'SMA_Short': SMAIndicator(data['Close'], window=short_window).sma_indicator(),
+        'SMA_Long': SMAIndicator(data['Close'], window=long_window).sma_indicator(),
+    })
+
+
+def _macd(data, fast, slow, signal):
+    macd = MACD(data['Close'], window_fast=fast, window_slow=slow, window_sign=signal)
+    return pd.DataFrame({'MACD': macd.macd(), 'MACD_Signal': macd.macd_signal(), 'MACD_Diff': macd.macd_diff()})
+
+
+def _rsi(data, rsi_period):
+    return pd.DataFrame({'RSI': RSIIndicator(data['Close'], window=rsi_period).rsi()})
+
+
+def _atr(data, atr_period):
+    atr = AverageTrueRange(data['High'], data['Low'], data['Close'], window=atr_period)
+    return pd.DataFrame({'ATR': atr.average_true_range()})
+
+
+# Indicator name -> function(data, **params) returning a DataFrame aligned to data.index
+INDICATORS = {
+    'SMA Crossover': _sma_crossover,
+    'MACD': _macd,
+    'RSI': _rsi,
+    'ATR': _atr,
+}
+
+
+def compute_indicator(data, indicator, params):
+    """Computes one registered indicator on an OHLC DataFrame with the given parameter dict."""
+    if indicator not in INDICATORS:
+        raise ValueError(f"Unknown indicator: {indicator}")
+    return INDICATORS[indicator](data, **params)
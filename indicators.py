@@ -0,0 +1,191 @@
+"""
+Array-in/array-out indicator kernels shared by the trading apps.
+
+The functions here take plain NumPy arrays and return NumPy arrays of the same
+length, so they can be reused by the Streamlit apps (through thin DataFrame
+adapters), the benchmarks and offline tools without pandas overhead.
+StreamingSuperTrend is the bar-by-bar counterpart used by the live bot.
+
+Run `python indicators.py` to check that the two agree.
+"""
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def true_range(high, low, close):
+    """True range; the first bar has no previous close, so it falls back to high - low."""
+    high = np.asarray(high, dtype='float64')
+    low = np.asarray(low, dtype='float64')
+    close = np.asarray(close, dtype='float64')
+    previous_close = np.empty_like(close)
+    previous_close[0] = np.nan
+    previous_close[1:] = close[:-1]
+    # fmax ignores NaN, matching DataFrame.max(axis=1) on the first bar
+    return np.fmax(np.fmax(np.abs(high - low), np.abs(high - previous_close)), np.abs(low - previous_close))
+
+
+def rolling_mean(values, window):
+    """Simple moving average with NaN for the first window - 1 values, like Series.rolling(window).mean()."""
+    values = np.asarray(values, dtype='float64')
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        out[window - 1:] = sliding_window_view(values, window).mean(axis=1)
+    return out
+
+
+def average_true_range(high, low, close, period):
+    """Simple-average ATR over `period` bars."""
+    return rolling_mean(true_range(high, low, close), period)
+
+
+def supertrend_bands(high, low, close, period, multiplier):
+    """
+    SuperTrend over whole arrays.
+
+    Returns (atr, upperband, lowerband, in_uptrend), each as long as the inputs. The first
+    period - 1 bars have no ATR yet: their bands are NaN and their trend is reported as up.
+
+    The ATR and the raw bands are computed vectorized. The trend/band recurrence is
+    path-dependent (a band is only carried forward while no breakout happens), so it runs
+    as a single pass over native floats instead of pandas label lookups.
+    """
+    high = np.asarray(high, dtype='float64')
+    low = np.asarray(low, dtype='float64')
+    close = np.asarray(close, dtype='float64')
+    atr = average_true_range(high, low, close, period)
+    hl2 = (high + low) / 2
+    upperband = hl2 + multiplier * atr
+    lowerband = hl2 - multiplier * atr
+    in_uptrend = np.ones(len(close), dtype=bool)
+
+    first = period - 1
+    if len(close) <= first + 1:
+        return atr, upperband, lowerband, in_uptrend
+
+    closes = close.tolist()
+    upper = upperband.tolist()
+    lower = lowerband.tolist()
+    trend = [True] * len(closes)
+    for current in range(first + 1, len(closes)):
+        previous = current - 1
+        if closes[current] > upper[previous]:
+            trend[current] = True
+        elif closes[current] < lower[previous]:
+            trend[current] = False
+        else:
+            trend[current] = trend[previous]
+            if trend[current] and lower[current] < lower[previous]:
+                lower[current] = lower[previous]
+            if not trend[current] and upper[current] > upper[previous]:
+                upper[current] = upper[previous]
+
+    return atr, np.array(upper), np.array(lower), np.array(trend, dtype=bool)
+
+
+class StreamingSuperTrend:
+    """
+    Incremental SuperTrend that keeps its ATR window and last bands between calls.
+
+    Each new bar is folded in with O(1) work: the ATR is a running sum of the window's true
+    ranges (re-summed every RESUM_BARS bars so rounding error cannot build up). It produces
+    the same values supertrend_bands would for the full series.
+    Only the most recent `history` rows are kept for display and signal checks.
+    """
+
+    RESUM_BARS = 10_000
+
+    def __init__(self, period, multiplier, history=200):
+        self.period = period
+        self.multiplier = multiplier
+        self.true_ranges = deque(maxlen=period)
+        self._true_range_sum = 0.0
+        self._bars_since_resum = 0
+        self.previous_close = None
+        self.upperband = None
+        self.lowerband = None
+        self.in_uptrend = True
+        self.last_timestamp = None
+        self.recent = deque(maxlen=history)
+
+    def update(self, timestamp, high, low, close):
+        """Adds one bar. Returns the bar's row dict, or None while the ATR is still warming up."""
+        high_low = abs(high - low)
+        if self.previous_close is None:
+            true_range = high_low
+        else:
+            true_range = max(high_low, abs(high - self.previous_close), abs(low - self.previous_close))
+        if len(self.true_ranges) == self.period:
+            self._true_range_sum -= self.true_ranges[0]  # about to be evicted by the append
+        self.true_ranges.append(true_range)
+        self._true_range_sum += true_range
+        self._bars_since_resum += 1
+        if self._bars_since_resum >= self.RESUM_BARS:
+            self._true_range_sum, self._bars_since_resum = sum(self.true_ranges), 0
+        self.previous_close = close
+        self.last_timestamp = timestamp
+        if len(self.true_ranges) < self.period:
+            return None
+
+        atr = self._true_range_sum / self.period
+        hl2 = (high + low) / 2
+        upperband = hl2 + self.multiplier * atr
+        lowerband = hl2 - self.multiplier * atr
+        if self.upperband is not None:
+            if close > self.upperband:
+                self.in_uptrend = True
+            elif close < self.lowerband:
+                self.in_uptrend = False
+            else:
+                if self.in_uptrend and lowerband < self.lowerband:
+                    lowerband = self.lowerband
+                if not self.in_uptrend and upperband > self.upperband:
+                    upperband = self.upperband
+        self.upperband, self.lowerband = upperband, lowerband
+
+        row = {'Timestamp': timestamp, 'High': high, 'Low': low, 'Close': close, 'atr': atr,
+               'upperband': upperband, 'lowerband': lowerband, 'in_uptrend': self.in_uptrend}
+        self.recent.append(row)
+        return row
+
+    def ingest(self, bars):
+        """Folds in the rows of an OHLC DataFrame that are newer than the last bar seen."""
+        if self.last_timestamp is not None:
+            bars = bars[bars.index > self.last_timestamp]
+        for timestamp, high, low, close in zip(bars.index, bars['High'].tolist(), bars['Low'].tolist(), bars['Close'].tolist()):
+            self.update(timestamp, high, low, close)
+        return len(bars)
+
+    def to_frame(self):
+        """Recent rows as a DataFrame shaped like the output of supertrend_bot.supertrend."""
+        if not self.recent:
+            return None
+        return pd.DataFrame(list(self.recent)).set_index('Timestamp')
+
+
+def _self_check(n_bars=5_000, seeds=range(5), period=7, multiplier=3):
+    """Checks StreamingSuperTrend, fed in uneven chunks, against supertrend_bands on random walks."""
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n_bars)))
+        spread = close * rng.uniform(0.0005, 0.004, n_bars)
+        bars = pd.DataFrame({'High': close + spread, 'Low': close - spread, 'Close': close},
+                            index=pd.date_range('2024-01-01', periods=n_bars, freq='min'))
+        atr, upperband, lowerband, in_uptrend = supertrend_bands(bars['High'], bars['Low'], bars['Close'],
+                                                                 period, multiplier)
+        streaming = StreamingSuperTrend(period, multiplier, history=n_bars)
+        for chunk_end in np.unique(np.r_[rng.integers(1, n_bars, 20), n_bars]):
+            streaming.ingest(bars.iloc[:chunk_end])  # overlapping frames, as the bot's polls are
+        actual = streaming.to_frame()
+        np.testing.assert_allclose(actual['atr'], atr[period - 1:], rtol=1e-9, err_msg=f"atr, seed {seed}")
+        np.testing.assert_allclose(actual['upperband'], upperband[period - 1:], rtol=1e-9, err_msg=f"upperband, seed {seed}")
+        np.testing.assert_allclose(actual['lowerband'], lowerband[period - 1:], rtol=1e-9, err_msg=f"lowerband, seed {seed}")
+        assert (actual['in_uptrend'].to_numpy() == in_uptrend[period - 1:]).all(), f"in_uptrend mismatch, seed {seed}"
+    print(f"StreamingSuperTrend matches supertrend_bands on {len(seeds)} random series of {n_bars:,} bars")
+
+
+if __name__ == '__main__':
+    _self_check()
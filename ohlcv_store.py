@@ -0,0 +1,245 @@
+"""
+Local columnar OHLCV store shared by the Yahoo Finance apps.
+
+Bars are kept in one Parquet file per (ticker, interval) under STORE_DIR.
+A request for a date range only downloads the bars that are missing from the
+file (older history before the first stored bar, or new bars after the last
+one); every other slice is served from local disk.
+
+The store keeps Yahoo's raw prices plus Adj Close. Readers get split- and
+dividend-adjusted OHLC by default (the same values as yfinance's auto_adjust,
+which the apps used before the store existed); pass adjusted=False for raw prices.
+A top-up that shows a changed adjustment on an already stored bar (a split or
+dividend since the last write) re-downloads the whole covered range.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import yfinance as yf
+
+STORE_DIR = os.environ.get("OHLCV_STORE_DIR", os.path.join(".cache", "ohlcv"))
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+# Don't ask Yahoo for the (still forming) latest bar more often than this
+TOP_UP_INTERVAL_SECONDS = 15 * 60
+PREFETCH_WORKERS = 8
+PREFETCH_RETRIES = 3
+PREFETCH_BACKOFF_SECONDS = 1.0
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+PERIOD_OFFSETS = {
+    "1d": pd.DateOffset(days=1), "5d": pd.DateOffset(days=5),
+    "1mo": pd.DateOffset(months=1), "3mo": pd.DateOffset(months=3), "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1), "2y": pd.DateOffset(years=2), "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+
+
+def _lock_for(key):
+    with _locks_guard:
+        if key not in _locks:
+            _locks[key] = threading.Lock()
+        return _locks[key]
+
+
+def _partition_path(ticker, interval):
+    safe_ticker = ticker.replace('^', '_').replace('/', '_')
+    return os.path.join(STORE_DIR, f"interval={interval}", f"ticker={safe_ticker}.parquet")
+
+
+def period_start(period, end=None):
+    """Translates a yfinance-style period string ("1mo", "ytd", "max", "7d", ...) into a start date."""
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.now().normalize()
+    if period == "max":
+        return pd.Timestamp("1900-01-01")
+    if period == "ytd":
+        return pd.Timestamp(year=end.year, month=1, day=1)
+    if period in PERIOD_OFFSETS:
+        return end - PERIOD_OFFSETS[period]
+    if period.endswith("d") and period[:-1].isdigit():
+        return end - pd.DateOffset(days=int(period[:-1]))
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def _empty_frame():
+    return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name='Date'), dtype='float64')
+
+
+def _normalize(data):
+    """Flattens yfinance output into a plain OHLCV frame sorted by timestamp."""
+    if data is None or data.empty:
+        return _empty_frame()
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.droplevel(1, axis=1)
+    data = data[[col for col in OHLCV_COLUMNS if col in data.columns]].copy()
+    data.index = pd.to_datetime(data.index)
+    data.index.name = 'Date'
+    data = data[~data.index.duplicated(keep='last')].sort_index()
+    return data.astype('float64')
+
+
+def fetch_bars(ticker, start, end, interval="1d"):
+    """Downloads raw bars (with Adj Close) from Yahoo Finance. `end` is exclusive, as in yf.download."""
+    data = yf.download(ticker, start=start, end=end, interval=interval,
+                       auto_adjust=False, progress=False, threads=False)
+    return _normalize(data)
+
+
+def _read_partition(path):
+    if not os.path.exists(path):
+        return None, {}
+    table = pq.read_table(path)
+    meta = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()
+            if not k.startswith(b'pandas')}
+    return table.to_pandas(), meta
+
+
+def _write_partition(path, data, meta):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(data, preserve_index=True)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           **{k: str(v) for k, v in meta.items()}})
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)  # atomic, so concurrent readers never see a half-written file
+
+
+def adjust_prices(data):
+    """Split- and dividend-adjusted OHLC from raw bars, as yfinance's auto_adjust computes them."""
+    if 'Adj Close' not in data.columns:
+        return data
+    ratio = (data['Adj Close'] / data['Close']).fillna(1.0)
+    adjusted = data.drop(columns='Adj Close')
+    price_columns = [col for col in ('Open', 'High', 'Low', 'Close') if col in adjusted.columns]
+    adjusted[price_columns] = adjusted[price_columns].mul(ratio, axis=0)
+    return adjusted
+
+
+def _adjustment_changed(stored, fetched):
+    """True when freshly fetched bars adjust an already stored bar differently."""
+    if 'Adj Close' not in stored.columns or 'Adj Close' not in fetched.columns:
+        return False
+    overlap = stored.index.intersection(fetched.index)
+    if overlap.empty:
+        return False
+    old = stored.loc[overlap, 'Adj Close'] / stored.loc[overlap, 'Close']
+    new = fetched.loc[overlap, 'Adj Close'] / fetched.loc[overlap, 'Close']
+    return not np.allclose(old, new, rtol=1e-6, equal_nan=True)
+
+
+def _to_naive(ts):
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize(None) if ts.tzinfo is not None else ts
+
+
+def load_ohlcv(ticker, start, end=None, interval="1d", fetch=fetch_bars, adjusted=True):
+    """
+    Returns bars for `ticker` with start <= timestamp < end, topping up the local store first.
+
+    Only the ranges not covered by earlier requests are downloaded: history older than the
+    first requested start, and bars newer than the last stored one (the last stored bar is
+    re-fetched since it may have been incomplete when it was written). While the covered
+    range still includes today, the latest bars are re-fetched every TOP_UP_INTERVAL_SECONDS.
+    """
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.now().normalize() + timedelta(days=1)
+    path = _partition_path(ticker, interval)
+
+    with _lock_for(path):
+        stored, meta = _read_partition(path)
+        pieces = [] if stored is None else [stored]
+        covered_start = pd.Timestamp(meta['covered_start']) if 'covered_start' in meta else None
+        covered_end = pd.Timestamp(meta['covered_end']) if 'covered_end' in meta else None
+        fetched_at = float(meta.get('fetched_at', 0))
+        updated = False
+
+        if covered_start is None:
+            fetched = fetch(ticker, start, end, interval)
+            # An empty first download is usually a failed request, so leave the range uncovered
+            if not fetched.empty:
+                pieces.append(fetched)
+                covered_start, covered_end, updated = start, end, True
+        else:
+            if start < covered_start:
+                fetched = fetch(ticker, start, covered_start, interval)
+                # As with the first download, an empty backfill leaves the older range uncovered
+                if not fetched.empty:
+                    pieces.append(fetched)
+                    covered_start, updated = start, True
+            stale = time.time() - fetched_at > TOP_UP_INTERVAL_SECONDS
+            # end=None means "through today", so a covered_end in the future still has a forming bar
+            still_forming = covered_end > pd.Timestamp.now()
+            if (end > covered_end and (stale or end - covered_end > timedelta(days=1))) or \
+                    (end >= covered_end and still_forming and stale):
+                top_up_from = _to_naive(stored.index[-1]).normalize() if not stored.empty else covered_end
+                fetched = fetch(ticker, top_up_from, max(end, covered_end), interval)
+                if stored is not None and _adjustment_changed(stored, fetched):
+                    # A split or dividend re-based the stored history: replace it rather than mix bases.
+                    # An empty re-download (e.g. rate-limited) keeps what is stored and the covered range.
+                    refetched = fetch(ticker, covered_start, max(end, covered_end), interval)
+                    if not refetched.empty:
+                        pieces = [refetched]
+                        covered_end, updated = max(end, covered_end), True
+                else:
+                    pieces.append(fetched)
+                    covered_end, updated = max(end, covered_end), True
+
+        if updated:
+            pieces = [piece for piece in pieces if not piece.empty]
+            data = pd.concat(pieces) if pieces else _empty_frame()
+            data = data[~data.index.duplicated(keep='last')].sort_index()
+            _write_partition(path, data, {'covered_start': covered_start.isoformat(),
+                                          'covered_end': covered_end.isoformat(),
+                                          'fetched_at': time.time()})
+        else:
+            data = stored if stored is not None else _empty_frame()
+
+    naive_index = data.index.tz_localize(None) if getattr(data.index, 'tz', None) is not None else data.index
+    data = data[(naive_index >= start) & (naive_index < end)]
+    return adjust_prices(data) if adjusted else data
+
+
+def load_ohlcv_period(ticker, period, interval="1d", fetch=fetch_bars, adjusted=True):
+    """Same as load_ohlcv but takes a yfinance period string such as "1y" or "max"."""
+    return load_ohlcv(ticker, period_start(period), interval=interval, fetch=fetch, adjusted=adjusted)
+
+
+def _prefetch_one(ticker, start, end, interval, retries, backoff, fetch):
+    started = time.perf_counter()
+    error = None
+    for attempt in range(1, retries + 1):
+        try:
+            data = load_ohlcv(ticker, start, end, interval=interval, fetch=fetch)
+            if data.empty:
+                raise ValueError("no bars returned")
+            return {'Ticker': ticker, 'Seconds': time.perf_counter() - started, 'Attempts': attempt,
+                    'Rows': len(data), 'Error': None}
+        except Exception as e:
+            error = str(e)
+            if attempt < retries:
+                time.sleep(backoff * 2 ** (attempt - 1))
+    return {'Ticker': ticker, 'Seconds': time.perf_counter() - started, 'Attempts': retries,
+            'Rows': 0, 'Error': error}
+
+
+def prefetch_ohlcv(tickers, start, end=None, interval="1d", max_workers=PREFETCH_WORKERS,
+                   retries=PREFETCH_RETRIES, backoff=PREFETCH_BACKOFF_SECONDS, fetch=fetch_bars):
+    """
+    Warms the store for a whole ticker universe using a bounded thread pool.
+
+    Each ticker is retried with exponential backoff. Returns a DataFrame with one row per
+    ticker (fetch latency, attempts, rows stored, last error), slowest first.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        reports = list(executor.map(
+            lambda ticker: _prefetch_one(ticker, start, end, interval, retries, backoff, fetch), tickers))
+    return pd.DataFrame(reports).sort_values('Seconds', ascending=False).reset_index(drop=True)
@@ -0,0 +1,71 @@
+"""
+Option-chain service shared by the option apps.
+
+Chains are cached per (ticker, expiration) for CHAIN_TTL_SECONDS, the spot
+price per ticker for SPOT_TTL_SECONDS and the list of listed expirations for
+EXPIRATIONS_TTL_SECONDS. Slider moves and reruns are served from memory, and
+several expirations are downloaded concurrently, so comparing N expirations
+costs about one round trip of wall time.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import pandas as pd
+import yfinance as yf
+
+from ttl_cache import TTLCache
+
+CHAIN_TTL_SECONDS = 5 * 60
+SPOT_TTL_SECONDS = 60
+EXPIRATIONS_TTL_SECONDS = 60 * 60
+CHAIN_WORKERS = 8
+
+_chains = TTLCache(CHAIN_TTL_SECONDS)
+_spots = TTLCache(SPOT_TTL_SECONDS)
+_expirations = TTLCache(EXPIRATIONS_TTL_SECONDS)
+
+
+def _expiration_key(expiration):
+    if isinstance(expiration, (date, datetime, pd.Timestamp)):
+        return expiration.strftime('%Y-%m-%d')
+    return str(expiration)
+
+
+def get_expirations(ticker):
+    """Listed expiration dates ('YYYY-MM-DD' strings, nearest first)."""
+    return _expirations.get(ticker, lambda: tuple(yf.Ticker(ticker).options))
+
+
+def nearest_expiration(ticker, target):
+    """The first listed expiration on or after `target`, else the last one listed."""
+    expirations = get_expirations(ticker)
+    if not expirations:
+        raise ValueError(f"No listed options for {ticker}")
+    target = _expiration_key(target)
+    return next((expiration for expiration in expirations if expiration >= target), expirations[-1])
+
+
+def get_spot(ticker):
+    """Latest close of the underlying."""
+    return _spots.get(ticker, lambda: float(yf.Ticker(ticker).history(period="1d")['Close'].iloc[-1]))
+
+
+def _download_chain(ticker, expiration):
+    chain = yf.Ticker(ticker).option_chain(expiration)
+    return chain.calls, chain.puts
+
+
+def get_chain(ticker, expiration):
+    """(calls, puts) DataFrames for one expiration. Callers get copies they are free to modify."""
+    expiration = _expiration_key(expiration)
+    calls, puts = _chains.get((ticker, expiration), lambda: _download_chain(ticker, expiration))
+    return calls.copy(), puts.copy()
+
+
+def get_chains(ticker, expirations, max_workers=CHAIN_WORKERS):
+    """{expiration: (calls, puts)} for several expirations, downloading the uncached ones concurrently."""
+    expirations = list(dict.fromkeys(_expiration_key(expiration) for expiration in expirations))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(expirations)))) as executor:
+        chains = executor.map(lambda expiration: get_chain(ticker, expiration), expirations)
+        return dict(zip(expirations, chains))
@@ -1,14 +1,11 @@
-import yfinance as yf
 import streamlit as st
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-
-# Function to download option chain data
-def get_option_chain(ticker, expiration):
-    stock = yf.Ticker(ticker)
-    options = stock.option_chain(expiration)
-    return options.calls, options.puts
+from black_scholes import RISK_FREE_RATE, chain_greeks, implied_volatility, time_to_expiry
+from strategy_payoff import LEG_TYPES, PRESETS, breakevens, expiry_pnl, preset_legs, scenario_pnl
+from option_chains import get_chain, get_expirations, get_spot
+from perf import StageTimer
 
 # Function to calculate mid prices and intrinsic values
 def calculate_values(calls, puts, underlying_price):
@@ -22,37 +19,140 @@ def calculate_values(calls, puts, underlying_price):
 
 # Streamlit app
 st.title("Option Chain Analysis")
+timer = StageTimer("optionapp.py")
 
 # User inputs
 ticker = st.text_input("Enter the ticker symbol", "AAPL")
-expiration = st.selectbox("Select expiration date", yf.Ticker(ticker).options)
-underlying_price = yf.Ticker(ticker).history(period="1d")['Close'].iloc[-1]
+with timer.stage("fetch"):
+    expiration = st.selectbox("Select expiration date", get_expirations(ticker))
+    underlying_price = get_spot(ticker)
 strike_range = st.slider("Select strike range (% of underlying)", 80, 120, (80, 120))
+risk_free_rate = st.number_input("Risk-free rate (%)", 0.0, 20.0, RISK_FREE_RATE * 100, 0.25) / 100
+
+# Download (or reuse the cached chain) and process data
+with timer.stage("chain"):
+    calls, puts = get_chain(ticker, expiration)
+with timer.stage("greeks"):
+    calls, puts = calculate_values(calls, puts, underlying_price)
+
+    # Implied volatility and Greeks for the whole chain (quotes with a zero bid or a crossed market get NaN)
+    calls = chain_greeks(calls, underlying_price, expiration, True, risk_free_rate)
+    puts = chain_greeks(puts, underlying_price, expiration, False, risk_free_rate)
+
+    # Filter by strike range
+    strike_min = underlying_price * (strike_range[0] / 100)
+    strike_max = underlying_price * (strike_range[1] / 100)
+    calls_filtered = calls[(calls['strike'] >= strike_min) & (calls['strike'] <= strike_max)]
+    puts_filtered = puts[(puts['strike'] >= strike_min) & (puts['strike'] <= strike_max)]
+
+with timer.stage("tables"):
+    # Display tables
+    greek_columns = ['iv', 'delta', 'gamma', 'theta', 'vega', 'rho', 'quote_status']
+    st.subheader("Call Options")
+    st.dataframe(calls_filtered[['strike', 'mid_price', 'intrinsic_value'] + greek_columns])
+
+    st.subheader("Put Options")
+    st.dataframe(puts_filtered[['strike', 'mid_price', 'intrinsic_value'] + greek_columns])
+
+with timer.stage("charts"):
+    # Plot mid prices and intrinsic values
+    fig, ax = plt.subplots()
+    ax.plot(calls_filtered['strike'], calls_filtered['mid_price'], label='Call Mid Price', marker='o')
+    ax.plot(puts_filtered['strike'], puts_filtered['mid_price'], label='Put Mid Price', marker='x')
+    ax.plot(calls_filtered['strike'], calls_filtered['intrinsic_value'], label='Call Intrinsic Value', linestyle='--')
+    ax.plot(puts_filtered['strike'], puts_filtered['intrinsic_value'], label='Put Intrinsic Value', linestyle='--')
+    ax.set_xlabel('Strike Price')
+    ax.set_ylabel('Price')
+    ax.legend()
+    st.pyplot(fig)
+
+    # Plot the implied volatility smile
+    fig_iv, ax_iv = plt.subplots()
+    ax_iv.plot(calls_filtered['strike'], calls_filtered['iv'], label='Call IV', marker='o')
+    ax_iv.plot(puts_filtered['strike'], puts_filtered['iv'], label='Put IV', marker='x')
+    ax_iv.axvline(underlying_price, color='grey', linestyle=':', label='Underlying')
+    ax_iv.set_xlabel('Strike Price')
+    ax_iv.set_ylabel('Implied Volatility')
+    ax_iv.legend()
+    st.pyplot(fig_iv)
+
+# --- Strategy builder: multi-leg P&L over spot x days x volatility scenarios ---
+st.subheader("Strategy Builder")
+preset = st.selectbox("Preset strategy", list(PRESETS))
+all_strikes = sorted(set(calls['strike']) | set(puts['strike']))
+legs_table = pd.DataFrame(preset_legs(preset, all_strikes, underlying_price), columns=['type', 'strike', 'quantity'])
+legs_table = st.data_editor(legs_table, num_rows="dynamic", key=f"legs_{ticker}_{expiration}_{preset}", column_config={
+    'type': st.column_config.SelectboxColumn('type', options=LEG_TYPES, required=True),
+    'strike': st.column_config.SelectboxColumn('strike', options=all_strikes, required=True),
+    'quantity': st.column_config.NumberColumn('quantity (+long / -short)', step=1, required=True),
+})
+
+with timer.stage("legs"):
+    # Price each leg from the chain: entry at the mid (last trade if the quote is unusable)
+    tenor = time_to_expiry(expiration)
+    legs = []
+    for leg in legs_table.dropna().itertuples(index=False):
+        if leg.type == 'stock':
+            legs.append({'type': 'stock', 'quantity': leg.quantity, 'premium': underlying_price})
+            continue
+        chain = calls if leg.type == 'call' else puts
+        quote = chain[chain['strike'] == leg.strike]
+        if quote.empty:
+            st.warning(f"No {leg.type} listed at strike {leg.strike}")
+            continue
+        quote = quote.iloc[0]
+        premium = quote['mid'] if np.isfinite(quote['mid']) else quote['lastPrice']
+        iv = quote['iv']
+        if not np.isfinite(iv) and np.isfinite(premium):
+            iv = implied_volatility([premium], underlying_price, leg.strike, tenor, risk_free_rate, leg.type == 'call')[0]
+        if not (np.isfinite(premium) and np.isfinite(iv)):
+            # One NaN leg would turn every scenario into NaN, so leave it out and say why
+            st.warning(f"Skipping {leg.type} {leg.strike}: no usable quote to price it or imply its volatility")
+            continue
+        legs.append({'type': leg.type, 'strike': leg.strike, 'quantity': leg.quantity, 'premium': premium,
+                     'iv': iv, 'tenor': tenor})
+
+if legs:
+    scenario_range = st.slider("Scenario spot range (% of underlying)", 50, 150, (80, 120))
+    vol_shift_range = st.slider("Volatility shift range (vol points)", -30, 30, (-10, 10))
+    spots = np.linspace(underlying_price * scenario_range[0] / 100, underlying_price * scenario_range[1] / 100, 200)
+    days_to_expiry = tenor * 365
+    days = np.linspace(0, days_to_expiry, 60)
+    vol_shifts = np.linspace(vol_shift_range[0], vol_shift_range[1], 10) / 100
+    with timer.stage("scenarios"):
+        pnl = scenario_pnl(legs, spots, days, vol_shifts, risk_free_rate)
+        at_expiry = expiry_pnl(legs, spots)
+
+    net_premium = sum(leg['premium'] * leg['quantity'] * (1 if leg['type'] == 'stock' else 100) for leg in legs)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Net Debit / Credit", f"${net_premium:,.2f}")
+    col2.metric("Max Profit (in range)", f"${at_expiry.max():,.2f}")
+    col3.metric("Max Loss (in range)", f"${at_expiry.min():,.2f}")
+    col4.metric("Breakevens", ", ".join(f"{b:.2f}" for b in breakevens(spots, at_expiry)) or "none")
+
+    with timer.stage("pnl_chart"):
+        # P&L against spot today, halfway and at expiry (no vol shift)
+        fig_pnl, ax_pnl = plt.subplots()
+        for day, label in ((0, 'Today'), (days_to_expiry / 2, f'{days_to_expiry / 2:.0f} days')):
+            ax_pnl.plot(spots, scenario_pnl(legs, spots, [day], [0.0], risk_free_rate)[:, 0, 0], label=label)
+        ax_pnl.plot(spots, at_expiry, label='At expiry', linestyle='--')
+        ax_pnl.axhline(0, color='grey', linewidth=0.8)
+        ax_pnl.axvline(underlying_price, color='grey', linestyle=':')
+        ax_pnl.set_xlabel('Underlying Price')
+        ax_pnl.set_ylabel('P&L ($)')
+        ax_pnl.legend()
+        st.pyplot(fig_pnl)
 
-# Download and process data
-calls, puts = get_option_chain(ticker, expiration)
-calls, puts = calculate_values(calls, puts, underlying_price)
-
-# Filter by strike range
-strike_min = underlying_price * (strike_range[0] / 100)
-strike_max = underlying_price * (strike_range[1] / 100)
-calls_filtered = calls[(calls['strike'] >= strike_min) & (calls['strike'] <= strike_max)]
-puts_filtered = puts[(puts['strike'] >= strike_min) & (puts['strike'] <= strike_max)]
-
-# Display tables
-st.subheader("Call Options")
-st.dataframe(calls_filtered[['strike', 'mid_price', 'intrinsic_value']])
-
-st.subheader("Put Options")
-st.dataframe(puts_filtered[['strike', 'mid_price', 'intrinsic_value']])
-
-# Plot mid prices and intrinsic values
-fig, ax = plt.subplots()
-ax.plot(calls_filtered['strike'], calls_filtered['mid_price'], label='Call Mid Price', marker='o')
-ax.plot(puts_filtered['strike'], puts_filtered['mid_price'], label='Put Mid Price', marker='x')
-ax.plot(calls_filtered['strike'], calls_filtered['intrinsic_value'], label='Call Intrinsic Value', linestyle='--')
-ax.plot(puts_filtered['strike'], puts_filtered['intrinsic_value'], label='Put Intrinsic Value', linestyle='--')
-ax.set_xlabel('Strike Price')
-ax.set_ylabel('Price')
-ax.legend()
-st.pyplot(fig)
\ No newline at end of file
+    # Heatmap of P&L over spot x days for one volatility shift
+    shift_index = st.select_slider("Volatility shift for heatmap", options=list(range(len(vol_shifts))),
+                                   value=int(np.abs(vol_shifts).argmin()),
+                                   format_func=lambda i: f"{vol_shifts[i] * 100:+.1f} vol pts")
+    with timer.stage("heatmap"):
+        fig_grid, ax_grid = plt.subplots()
+        limit = np.abs(pnl[:, :, shift_index]).max() or 1
+        image = ax_grid.imshow(pnl[:, :, shift_index].T, aspect='auto', origin='lower', cmap='RdYlGn', vmin=-limit, vmax=limit,
+                               extent=[spots[0], spots[-1], days[0], days[-1]])
+        ax_grid.set_xlabel('Underlying Price')
+        ax_grid.set_ylabel('Days from Now')
+        fig_grid.colorbar(image, ax=ax_grid, label='P&L ($)')
+        st.pyplot(fig_grid)
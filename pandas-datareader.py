@@ -1,7 +1,17 @@
 import streamlit as st
+import pandas_datareader as pdr
 import pandas_datareader.data as web
+from pandas_datareader import tsp
+from pandas_datareader.nasdaq_trader import get_nasdaq_symbols
 from datetime import datetime
 import os
+from fanout import fan_out
+from perf import StageTimer
+from ttl_cache import TTLCache
+
+# Slow providers get longer than the default per-source timeout (fanout.DEFAULT_TIMEOUT_SECONDS)
+SOURCE_TIMEOUTS = {"OECD": 30, "Eurostat": 30, "World Bank": 30}
+RESULT_TTL_SECONDS = 60 * 60
 
 # Set API keys for services that require them
 os.environ['TIINGO_API_KEY'] = 'your_tiingo_api_key'
@@ -39,12 +49,27 @@ def load_data():
 st.title("Pandas Datareader Example Data")
 st.write("This app demonstrates downloading data from various sources using pandas-datareader.")
 
+timer = StageTimer("pandas-datareader.py")
+
+# Successful downloads are shared by every session for RESULT_TTL_SECONDS
+@st.cache_resource
+def get_result_cache():
+    return TTLCache(RESULT_TTL_SECONDS)
+
 data_sources = load_data()
 
-for source_name, data_func in data_sources.items():
+# One section per source, filled in as soon as that source answers
+sections = {}
+for source_name in data_sources:
     st.subheader(source_name)
-    try:
-        df = data_func()
-        st.write(df.head())
-    except Exception as e:
-        st.error(f"Failed to load data from {source_name}: {e}")
+    sections[source_name] = st.empty()
+    sections[source_name].caption("Loading...")
+
+with timer.stage("sources"):
+    for source_name, df, error, seconds in fan_out(data_sources, SOURCE_TIMEOUTS, cache=get_result_cache()):
+        with sections[source_name].container():
+            if error is None:
+                st.write(df.head())
+                st.caption(f"Loaded in {seconds:.1f}s")
+            else:
+                st.error(f"Failed to load data from {source_name}: {error}")
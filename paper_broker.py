@@ -0,0 +1,163 @@
+"""
+Offline stand-in for the Alpaca REST client, for running the SuperTrend bot without credentials.
+
+PaperBroker implements the calls the bot makes (get_crypto_bars, get_account,
+get_position, submit_order) on a table of minute bars and a simulated clock. Only
+bars that have closed by the clock are visible, and market orders fill at the latest
+close. replay() moves the clock forward one poll interval at a time and runs
+supertrend_bot.run_bot_cycle at each step, either paced (`speed` times real time) or
+as fast as possible, so weeks of cycles run in seconds.
+
+Usage (from the repository root):
+    python paper_broker.py --days 14
+    python paper_broker.py --bars btc_minutes.parquet --speed 60 --log-dir paper_log
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from supertrend_bot import LOOKBACK_PERIODS, POLL_INTERVAL_SECONDS, SYMBOL, run_bot_cycle
+
+STARTING_CASH = 100_000.0
+BAR_MINUTES = 1
+
+
+def load_bars(path):
+    """Recorded minute bars from a Parquet or CSV file with a timestamp index (or column) and OHLCV columns."""
+    bars = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+    bars.columns = [str(col).lower() for col in bars.columns]
+    for column in ('timestamp', 'date', 'datetime'):
+        if column in bars.columns:
+            bars = bars.set_index(column)
+            break
+    return bars
+
+
+def synthetic_bars(days, seed=42):
+    """A deterministic random walk of minute bars (see benchmarks/synthetic.py)."""
+    from benchmarks.synthetic import synthetic_ohlcv
+    return synthetic_ohlcv(days * 24 * 60, freq='1min', seed=seed)
+
+
+class PaperBroker:
+    """Simulated account trading one symbol against replayed minute bars."""
+
+    def __init__(self, bars, cash=STARTING_CASH, symbol=SYMBOL):
+        bars = bars.copy()
+        bars.columns = [str(col).lower() for col in bars.columns]
+        bars.index = pd.DatetimeIndex(bars.index)
+        bars.index = bars.index.tz_localize('UTC') if bars.index.tz is None else bars.index.tz_convert('UTC')
+        self.bars = bars[['open', 'high', 'low', 'close', 'volume']].sort_index()
+        self.symbol = symbol.replace('/', '')
+        self.cash = cash
+        self.qty = 0.0
+        self.cost_basis = 0.0
+        self.orders = []
+        self._close_times = self.bars.index + pd.Timedelta(minutes=BAR_MINUTES)
+        self._closes = self.bars['close'].to_numpy()
+        # Start once the bot's first full lookback has closed
+        self.now = self._close_times[0] + pd.Timedelta(minutes=LOOKBACK_PERIODS * 2 + 10)
+
+    def advance(self, seconds):
+        """Moves the clock forward; False once it has passed the last bar."""
+        self.now += pd.Timedelta(seconds=seconds)
+        return self.now <= self._close_times[-1]
+
+    def last_price(self):
+        closed = np.searchsorted(self._close_times, self.now, side='right')
+        return float(self._closes[max(closed - 1, 0)])
+
+    # --- The subset of alpaca_trade_api.REST the bot uses ---
+
+    def get_crypto_bars(self, symbol, timeframe, start=None, end=None):
+        index = self.bars.index
+        first = 0 if start is None else index.searchsorted(pd.Timestamp(start), side='left')
+        last = np.searchsorted(self._close_times, self.now, side='right')
+        if end is not None: last = min(last, index.searchsorted(pd.Timestamp(end), side='right'))
+        return SimpleNamespace(df=self.bars.iloc[first:max(last, first)].copy())
+
+    def get_account(self):
+        equity = self.cash + self.qty * self.last_price()
+        return SimpleNamespace(status='ACTIVE', equity=str(equity), cash=str(self.cash), buying_power=str(max(self.cash, 0.0)))
+
+    def get_position(self, symbol):
+        if symbol != self.symbol or abs(self.qty) < 1e-12:
+            raise Exception("position does not exist")
+        market_value = self.qty * self.last_price()
+        return SimpleNamespace(symbol=self.symbol, qty=str(self.qty), side='long' if self.qty > 0 else 'short',
+                               market_value=str(market_value), unrealized_pl=str(market_value - self.cost_basis),
+                               avg_entry_price=str(self.cost_basis / self.qty))
+
+    def submit_order(self, symbol, qty, side, type='market', time_in_force='gtc'):
+        """Fills market orders immediately at the last closed bar's price."""
+        if symbol != self.symbol or type != 'market':
+            raise Exception(f"paper broker only fills market orders for {self.symbol}")
+        qty = float(qty)
+        price = self.last_price()
+        signed = qty if side == 'buy' else -qty
+        if self.qty and np.sign(signed) != np.sign(self.qty):
+            # Reducing a position releases its cost basis pro rata
+            self.cost_basis *= max(1 - qty / abs(self.qty), 0.0)
+        else:
+            self.cost_basis += signed * price
+        self.qty += signed
+        self.cash -= signed * price
+        order = SimpleNamespace(id=str(len(self.orders) + 1), symbol=symbol, qty=str(qty), side=side, type=type,
+                                status='filled', filled_at=self.now, filled_avg_price=str(price))
+        self.orders.append(order)
+        return order
+
+
+def replay(broker, cycles=None, speed=None, interval=POLL_INTERVAL_SECONDS, log_dir=None, verbose=False):
+    """
+    Runs run_bot_cycle every `interval` simulated seconds until the bars (or `cycles`) run out.
+
+    speed=None runs as fast as possible; otherwise simulated time passes `speed` times faster
+    than real time. Returns the final run state and the CPU seconds each cycle took.
+    """
+    state = {}
+    cpu_seconds = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stdout if verbose else devnull):
+        while (cycles is None or len(cpu_seconds) < cycles) and broker.advance(interval):
+            started = time.process_time()
+            state = run_bot_cycle(broker, state, now=broker.now, log_dir=log_dir)
+            cpu_seconds.append(time.process_time() - started)
+            if speed:
+                time.sleep(interval / speed)
+    return state, np.array(cpu_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the SuperTrend bot against a paper broker")
+    parser.add_argument('--bars', help="Parquet/CSV file of recorded minute bars (default: synthetic)")
+    parser.add_argument('--days', type=int, default=7, help="days of synthetic bars")
+    parser.add_argument('--cycles', type=int)
+    parser.add_argument('--speed', type=float, help="times real time (default: as fast as possible)")
+    parser.add_argument('--log-dir', help="write the trading log here (default: no log)")
+    parser.add_argument('--cash', type=float, default=STARTING_CASH)
+    args = parser.parse_args()
+
+    bars = load_bars(args.bars) if args.bars else synthetic_bars(args.days)
+    broker = PaperBroker(bars, cash=args.cash)
+    started = time.perf_counter()
+    state, cpu_seconds = replay(broker, args.cycles, args.speed, log_dir=args.log_dir)
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(cpu_seconds)} cycles in {elapsed:.1f}s, {len(broker.orders)} orders")
+    if len(cpu_seconds):
+        print(f"CPU per cycle: mean {cpu_seconds.mean() * 1000:.2f} ms, "
+              f"p95 {np.percentile(cpu_seconds, 95) * 1000:.2f} ms, max {cpu_seconds.max() * 1000:.2f} ms")
+    account = broker.get_account()
+    print(f"Final equity {float(account.equity):,.2f} (start {args.cash:,.2f}), "
+          f"cumulative realized PnL {state.get('cumulative_realized_pnl', 0.0):,.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Per-stage timing for the Streamlit apps.
+
+Each app creates one StageTimer per rerun, named after its script, and wraps its fetch, compute, figure and
+render stages in `with timer.stage(name):` (or decorates a function with
+`@timer.timed(name)`). Every finished stage is:
+  - shown in an optional "Performance" panel (a sidebar expander by default),
+  - appended to a metrics file: CSV rows (default; rotated to one .csv.1 backup at
+    PERF_CSV_MAX_BYTES) or a Prometheus text-format file of per-stage counters
+    (PERF_METRICS_FORMAT=prometheus; "none" disables it).
+The panel also offers "Profile one rerun", which runs the stages of the next rerun
+under cProfile and shows the top functions.
+
+The panel and the metrics are updated as each stage ends, so scripts that finish
+early with st.stop() are still covered.
+"""
+
+import cProfile
+import csv
+import io
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+import streamlit as st
+
+PERF_DIR = os.environ.get("PERF_DIR", os.path.join(".cache", "perf"))
+METRICS_FORMAT = os.environ.get("PERF_METRICS_FORMAT", "csv")   # csv, prometheus or none
+CSV_PATH = os.path.join(PERF_DIR, "stage_timings.csv")
+CSV_MAX_BYTES = int(os.environ.get("PERF_CSV_MAX_BYTES", 10 * 1024 * 1024))   # then rotated to .csv.1
+PROMETHEUS_PATH = os.path.join(PERF_DIR, "stage_timings.prom")
+PROFILE_TOP = 25
+
+_metrics_lock = threading.Lock()
+_totals = {}   # (app, stage) -> [count, total seconds, last seconds], for the Prometheus file
+
+
+def _write_csv(row):
+    os.makedirs(PERF_DIR, exist_ok=True)
+    with _metrics_lock:
+        if os.path.exists(CSV_PATH) and os.path.getsize(CSV_PATH) >= CSV_MAX_BYTES:
+            os.replace(CSV_PATH, f"{CSV_PATH}.1")   # keep one older file, drop the one before it
+        new_file = not os.path.exists(CSV_PATH)
+        with open(CSV_PATH, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(['timestamp', 'app', 'run_id', 'stage', 'seconds'])
+            writer.writerow(row)
+
+
+def _write_prometheus(app, stage, seconds):
+    os.makedirs(PERF_DIR, exist_ok=True)
+    with _metrics_lock:
+        totals = _totals.setdefault((app, stage), [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = seconds
+        lines = [
+            "# HELP streamlit_stage_seconds_total Time spent in each app stage.",
+            "# TYPE streamlit_stage_seconds_total counter",
+            *(f'streamlit_stage_seconds_total{{app="{a}",stage="{s}"}} {t[1]:.6f}' for (a, s), t in _totals.items()),
+            "# HELP streamlit_stage_runs_total Times each app stage ran.",
+            "# TYPE streamlit_stage_runs_total counter",
+            *(f'streamlit_stage_runs_total{{app="{a}",stage="{s}"}} {t[0]}' for (a, s), t in _totals.items()),
+            "# HELP streamlit_stage_last_seconds Duration of the latest run of each app stage.",
+            "# TYPE streamlit_stage_last_seconds gauge",
+            *(f'streamlit_stage_last_seconds{{app="{a}",stage="{s}"}} {t[2]:.6f}' for (a, s), t in _totals.items()),
+        ]
+        # Replaced atomically, as the node-exporter textfile collector expects
+        tmp_path = f"{PROMETHEUS_PATH}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, PROMETHEUS_PATH)
+
+
+def record(app, run_id, stage, seconds):
+    """Appends one stage timing to the metrics file in the configured format."""
+    try:
+        if METRICS_FORMAT == "csv":
+            _write_csv([datetime.now().isoformat(timespec='milliseconds'), app, run_id, stage, f"{seconds:.6f}"])
+        elif METRICS_FORMAT == "prometheus":
+            _write_prometheus(app, stage, seconds)
+    except OSError as e:
+        print(f"Could not write performance metrics: {e}")
+
+
+class StageTimer:
+    """Times the stages of one script run of `app`."""
+
+    def __init__(self, app, container=None):
+        self.app = app
+        self.run_id = uuid.uuid4().hex[:8]
+        self.stages = []
+        self.profiler = None
+        self._depth = 0
+        container = st.sidebar if container is None else container
+        with container.expander("Performance"):
+            self.show = st.checkbox("Show stage timings", key=f"_perf_show_{app}")
+            if st.button("Profile one rerun", key=f"_perf_profile_{app}"):
+                self.profiler = cProfile.Profile()
+            self._panel = st.empty()
+
+    @contextmanager
+    def stage(self, name):
+        # Nested stages (e.g. a timed function called inside a stage) share the outer profiling window
+        self._depth += 1
+        if self.profiler and self._depth == 1: self.profiler.enable()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            if self.profiler and self._depth == 1: self.profiler.disable()
+            self._depth -= 1
+            self.stages.append((name, seconds, self._depth == 0))
+            record(self.app, self.run_id, name, seconds)
+            self._render()
+
+    def timed(self, name=None):
+        """Decorator form of stage(); the stage defaults to the function's name."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _render(self):
+        if not (self.show or self.profiler):
+            return
+        with self._panel.container():
+            if self.show:
+                total = sum(seconds for _, seconds, outermost in self.stages if outermost)
+                st.dataframe({'stage': [name for name, _, _ in self.stages] + ['total'],
+                              'ms': [round(seconds * 1000, 1) for _, seconds, _ in self.stages] + [round(total * 1000, 1)]},
+                             hide_index=True)
+            if self.profiler:
+                out = io.StringIO()
+                pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+                st.caption("cProfile of this rerun's stages (cumulative time)")
+                st.code(out.getvalue())
@@ -1,9 +1,10 @@
 import streamlit as st
-import yfinance as yf
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.optimize import curve_fit
-import pwlf
+from ohlcv_store import load_ohlcv_period
+from segmentation import fit_cached, predict
+from perf import StageTimer
 
 # Define function for piecewise linear fitting
 def piecewise_linear(x, x0, y0, k1, k2):
@@ -18,43 +19,52 @@ st.sidebar.title("Stock/ETF Selector")
 selected_symbol = st.sidebar.selectbox("Select a Stock/ETF", symbols)
 
 period = st.sidebar.number_input("Select period (days)", min_value=1, value=7)
+engine = st.sidebar.radio("Fitting Engine", ["exact", "pwlf"],
+                          help="Exact breakpoint search, or pwlf's differential-evolution search. Fits are cached on disk.")
+
+timer = StageTimer("piecewise-linear.py")
 
 # Download data
-data = yf.download(selected_symbol, period=f'{period}d')
+with timer.stage("fetch"):
+    data = load_ohlcv_period(selected_symbol, f'{period}d')
 #data = yf.download(selected_symbol, period='1mo')
 
 st.title(f"{selected_symbol} Price Analysis")
 
 if not data.empty:
-    st.line_chart(data['Close'])
+    with timer.stage("chart"):
+        st.line_chart(data['Close'])
 
     # Perform piecewise linear fitting
-    x = np.arange(len(data))
-    y = data['Close'].values
+    with timer.stage("compute"):
+        x = np.arange(len(data))
+        y = data['Close'].values
 
-    # Fit the model
-    pwlf_model = pwlf.PiecewiseLinFit(x, y)
-    breaks = pwlf_model.fit(2)
-    y_hat = pwlf_model.predict(x)
+        # Fit the model (reused from the disk cache when this exact series was fitted before)
+        fit = fit_cached(x, y, 2, engine)
+        breaks = fit.fit_breaks
+        y_hat = predict(fit, x)
 
     # Plotting
-    fig, ax = plt.subplots()
-    ax.plot(x, y, 'bo', label='Data')
-    ax.plot(x, y_hat, 'r-', label='Fitted Piecewise')
-    ax.set_xlabel('Days')
-    ax.set_ylabel('Price')
-    ax.set_title('Piecewise Linear Fit')
-    ax.legend()
-
-    st.pyplot(fig)
-
-    # Display fitting results
-    slopes = pwlf_model.slopes
-    intercepts = pwlf_model.intercepts
-
-    st.write(f"Slopes: {slopes}")
-    st.write(f"Intercepts: {intercepts}")
-    st.write(f"Breakpoints: {breaks}")
+    with timer.stage("figure"):
+        fig, ax = plt.subplots()
+        ax.plot(x, y, 'bo', label='Data')
+        ax.plot(x, y_hat, 'r-', label='Fitted Piecewise')
+        ax.set_xlabel('Days')
+        ax.set_ylabel('Price')
+        ax.set_title('Piecewise Linear Fit')
+        ax.legend()
+
+    with timer.stage("render"):
+        st.pyplot(fig)
+
+        # Display fitting results
+        slopes = fit.slopes
+        intercepts = fit.intercepts
+
+        st.write(f"Slopes: {slopes}")
+        st.write(f"Intercepts: {intercepts}")
+        st.write(f"Breakpoints: {breaks}")
 
 else:
     st.write("No data available for the selected period.")
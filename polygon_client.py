@@ -0,0 +1,194 @@
+"""
+Polygon.io aggregates client shared by the Polygon apps.
+
+All requests go through one keep-alive requests.Session, retried with backoff on
+rate limits and server errors. A range longer than one response is followed
+through `next_url` until every page has been read. Several tickers are fetched
+concurrently.
+
+Bars are cached on disk as one Parquet file per (ticker, multiplier, timespan)
+under CACHE_DIR, together with the list of trading days already covered. A request
+only downloads the days that are not covered yet. Days that have not finished
+(today and later) are always re-fetched.
+
+The API key comes from POLYGON_API_KEY in the environment or Streamlit secrets.
+POLYGON_BASE_URL points the client at another server, e.g. a local stand-in.
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BASE_URL = os.environ.get("POLYGON_BASE_URL", "https://api.polygon.io")
+CACHE_DIR = os.environ.get("POLYGON_CACHE_DIR", os.path.join(".cache", "polygon"))
+MARKET_TZ = 'America/New_York'  # Polygon dates (and so cached days) are exchange dates
+PAGE_LIMIT = 50_000
+REQUEST_TIMEOUT_SECONDS = 30
+REQUEST_RETRIES = 3
+TICKER_WORKERS = 8
+AGG_COLUMNS = ['t', 'o', 'h', 'l', 'c', 'v', 'vw', 'n']
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def get_api_key():
+    """POLYGON_API_KEY from the environment, else from Streamlit secrets (None if neither is set)."""
+    key = os.environ.get("POLYGON_API_KEY")
+    if key:
+        return key
+    try:
+        import streamlit as st
+        return st.secrets.get("POLYGON_API_KEY")
+    except Exception:  # no secrets file, or not running under Streamlit
+        return None
+
+
+def _lock_for(key):
+    with _locks_guard:
+        if key not in _locks:
+            _locks[key] = threading.Lock()
+        return _locks[key]
+
+
+def _empty_frame():
+    frame = pd.DataFrame({col: pd.Series(dtype='float64') for col in AGG_COLUMNS})
+    return frame.astype({'t': 'datetime64[ns]'})
+
+
+def _to_frame(results):
+    """Polygon aggregate results -> DataFrame with `t` as naive UTC timestamps."""
+    if not results:
+        return _empty_frame()
+    frame = pd.DataFrame(results).reindex(columns=AGG_COLUMNS)
+    frame['t'] = pd.to_datetime(frame['t'], unit='ms')
+    return frame.astype({col: 'float64' for col in AGG_COLUMNS[1:]})
+
+
+def _trading_days(times):
+    return times.dt.tz_localize('UTC').dt.tz_convert(MARKET_TZ).dt.date
+
+
+def missing_day_runs(start, end, covered):
+    """Contiguous (first, last) day ranges in [start, end] that are not in `covered`."""
+    runs = []
+    for day in pd.date_range(start, end, freq='D').date:
+        if day in covered:
+            continue
+        if runs and runs[-1][1] == day - timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+class PolygonClient:
+    """Reads aggregate bars from Polygon, caching completed days on disk."""
+
+    def __init__(self, api_key=None, base_url=BASE_URL, cache_dir=CACHE_DIR, timeout=REQUEST_TIMEOUT_SECONDS):
+        self.api_key = api_key or get_api_key()
+        if not self.api_key:
+            raise RuntimeError("POLYGON_API_KEY is not set (environment or Streamlit secrets).")
+        self.base_url = base_url.rstrip('/')
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=REQUEST_RETRIES, backoff_factor=1.0, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET']))
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=TICKER_WORKERS, max_retries=retry))
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=TICKER_WORKERS, max_retries=retry))
+
+    def _get(self, url, params=None):
+        # next_url links carry the query but not the key, so the key is always added here
+        response = self.session.get(url, params={**(params or {}), 'apiKey': self.api_key}, timeout=self.timeout)
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        if not response.ok or payload.get('status') in ('ERROR', 'NOT_AUTHORIZED'):
+            message = payload.get('error') or payload.get('message') or response.reason
+            raise RuntimeError(f"Polygon request failed ({response.status_code}): {message}")
+        return payload
+
+    def iter_pages(self, ticker, start, end, multiplier=1, timespan='day'):
+        """Yields the `results` list of every page for the range, following next_url."""
+        url = f"{self.base_url}/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{start}/{end}"
+        params = {'adjusted': 'true', 'sort': 'asc', 'limit': PAGE_LIMIT}
+        while url:
+            payload = self._get(url, params)
+            yield payload.get('results') or []
+            url, params = payload.get('next_url'), None
+
+    def fetch_aggs(self, ticker, start, end, multiplier=1, timespan='day'):
+        """All bars from `start` to `end` (inclusive dates), straight from the API."""
+        pieces = [_to_frame(results) for results in self.iter_pages(ticker, start, end, multiplier, timespan)]
+        pieces = [piece for piece in pieces if not piece.empty]
+        return pd.concat(pieces, ignore_index=True) if pieces else _empty_frame()
+
+    # --- On-disk cache ---
+
+    def _cache_path(self, ticker, multiplier, timespan):
+        safe_ticker = ticker.replace(':', '_').replace('^', '_').replace('/', '_')
+        return os.path.join(self.cache_dir, f"{multiplier}{timespan}", f"{safe_ticker}.parquet")
+
+    def _read_cache(self, path):
+        if not os.path.exists(path):
+            return _empty_frame(), set()
+        table = pq.read_table(path)
+        covered = json.loads((table.schema.metadata or {}).get(b'covered_days', b'[]'))
+        return table.to_pandas(), {pd.Timestamp(day).date() for day in covered}
+
+    def _write_cache(self, path, data, covered):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        covered_days = json.dumps(sorted(day.isoformat() for day in covered))
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), 'covered_days': covered_days})
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)  # atomic, so concurrent readers never see a half-written file
+
+    def get_aggs(self, ticker, start, end, multiplier=1, timespan='day'):
+        """
+        Bars from `start` to `end` (inclusive dates), downloading only the days not cached yet.
+
+        Each missing run of consecutive days is one paginated request. Fetched days before
+        today are marked as covered, including days without bars (weekends, holidays).
+        """
+        start, end = pd.Timestamp(start).date(), pd.Timestamp(end).date()
+        path = self._cache_path(ticker, multiplier, timespan)
+        today = pd.Timestamp.now(tz=MARKET_TZ).date()
+
+        with _lock_for(path):
+            data, covered = self._read_cache(path)
+            runs = missing_day_runs(start, end, covered)
+            if runs:
+                pieces = [data]
+                for first, last in runs:
+                    fetched = self.fetch_aggs(ticker, first, last, multiplier, timespan)
+                    days = _trading_days(pieces[0]['t'])
+                    pieces[0] = pieces[0][(days < first) | (days > last)]
+                    pieces.append(fetched)
+                    covered.update(day for day in pd.date_range(first, min(last, today - timedelta(days=1)), freq='D').date)
+                pieces = [piece for piece in pieces if not piece.empty]
+                data = pd.concat(pieces, ignore_index=True) if pieces else _empty_frame()
+                data = data.drop_duplicates('t', keep='last').sort_values('t', ignore_index=True)
+                self._write_cache(path, data, covered)
+
+        days = _trading_days(data['t'])
+        return data[(days >= start) & (days <= end)].reset_index(drop=True)
+
+    def get_many(self, tickers, start, end, multiplier=1, timespan='day', max_workers=TICKER_WORKERS):
+        """{ticker: bars} for several tickers, fetched concurrently over the shared session."""
+        tickers = list(dict.fromkeys(tickers))
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers)))) as executor:
+            frames = executor.map(lambda ticker: self.get_aggs(ticker, start, end, multiplier, timespan), tickers)
+            return dict(zip(tickers, frames))
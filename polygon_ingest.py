@@ -0,0 +1,169 @@
+"""
+Streaming ingestion of Polygon minute bars into day-partitioned Parquet.
+
+A year of minute bars is too large for one response or one DataFrame, so ingest()
+walks the date range in chunks of CHUNK_DAYS. It reads each chunk page by page
+(PolygonClient.iter_pages), turns every page straight into a typed Arrow record
+batch and writes each finished exchange day to its own file:
+
+    INGEST_DIR/<ticker>/date=YYYY-MM-DD/bars.parquet
+
+At most one day's batches are held in memory. The days already ingested are listed in
+the ticker's covered_days.json, so re-running only fetches what is missing. Days
+that have not finished are always re-fetched, as in polygon_client.
+
+query() opens the partitions as a pyarrow dataset and reads only the days (and
+columns) requested, so an app pays for the window on screen rather than the whole history.
+
+Usage (from the repository root, with POLYGON_API_KEY set):
+    python polygon_ingest.py I:SPX I:VIX --start 2024-01-01 --end 2024-12-31
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from polygon_client import MARKET_TZ, TICKER_WORKERS, PolygonClient, missing_day_runs
+
+INGEST_DIR = os.environ.get("POLYGON_MINUTE_DIR", os.path.join(".cache", "polygon_minutes"))
+CHUNK_DAYS = 20  # ~20k extended-hours minutes per request, well under Polygon's 50k page limit
+COVERED_FILE = "covered_days.json"
+SCHEMA = pa.schema([
+    ('t', pa.timestamp('ms')),  # bar start, naive UTC as in polygon_client
+    ('o', pa.float64()), ('h', pa.float64()), ('l', pa.float64()), ('c', pa.float64()),
+    ('v', pa.float64()), ('vw', pa.float64()), ('n', pa.int64()),
+])
+PARTITIONING = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+DATASET_SCHEMA = SCHEMA.append(pa.field('date', pa.string()))
+
+
+def _ticker_dir(ticker, base_dir):
+    return os.path.join(base_dir, ticker.replace(':', '_').replace('^', '_').replace('/', '_'))
+
+
+def _read_covered(ticker_dir):
+    path = os.path.join(ticker_dir, COVERED_FILE)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {pd.Timestamp(day).date() for day in json.load(f)}
+
+
+def _write_covered(ticker_dir, covered):
+    path = os.path.join(ticker_dir, COVERED_FILE)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(sorted(day.isoformat() for day in covered), f)
+    os.replace(tmp_path, path)
+
+
+def _write_day(ticker_dir, day, batches):
+    day_dir = os.path.join(ticker_dir, f"date={day.isoformat()}")
+    os.makedirs(day_dir, exist_ok=True)
+    path = os.path.join(day_dir, "bars.parquet")
+    # Dot-prefixed, so dataset scans skip it until it is renamed into place
+    tmp_path = os.path.join(day_dir, f".bars.{os.getpid()}.{threading.get_ident()}.tmp")
+    pq.write_table(pa.Table.from_batches(batches, schema=SCHEMA), tmp_path)
+    os.replace(tmp_path, path)  # atomic, so a concurrent query never sees a half-written day
+
+
+def _page_days(batch):
+    """Exchange day of each row of a batch (rows arrive sorted by time)."""
+    times = pd.to_datetime(batch.column('t').to_numpy(), utc=True).tz_convert(MARKET_TZ)
+    return times.normalize().date
+
+
+def _ingest_chunk(client, ticker, first, last, ticker_dir):
+    """Streams one chunk's pages to day files; returns the number of bars written."""
+    current_day, pending, rows = None, [], 0
+    for results in client.iter_pages(ticker, first, last, 1, 'minute'):
+        if not results:
+            continue
+        batch = pa.RecordBatch.from_pylist(results, schema=SCHEMA)
+        days = _page_days(batch)
+        # Split the page where the day changes; a day can continue on the next page
+        boundaries = np.flatnonzero(days[1:] != days[:-1]) + 1
+        for begin, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(days)]):
+            if days[begin] != current_day:
+                if pending: _write_day(ticker_dir, current_day, pending)
+                current_day, pending = days[begin], []
+            pending.append(batch.slice(begin, end - begin))
+            rows += int(end - begin)
+    if pending:
+        _write_day(ticker_dir, current_day, pending)
+    return rows
+
+
+def ingest(client, ticker, start, end, base_dir=INGEST_DIR, chunk_days=CHUNK_DAYS):
+    """
+    Ingests minute bars for `ticker` from `start` to `end` (inclusive dates), skipping covered days.
+
+    Returns the number of bars written.
+    """
+    start, end = pd.Timestamp(start).date(), pd.Timestamp(end).date()
+    ticker_dir = _ticker_dir(ticker, base_dir)
+    os.makedirs(ticker_dir, exist_ok=True)
+    today = pd.Timestamp.now(tz=MARKET_TZ).date()
+    rows = 0
+    covered = _read_covered(ticker_dir)
+    for first, last in missing_day_runs(start, end, covered):
+        while first <= last:
+            chunk_last = min(first + timedelta(days=chunk_days - 1), last)
+            rows += _ingest_chunk(client, ticker, first, chunk_last, ticker_dir)
+            # Recorded after every chunk, so an interrupted ingest resumes where it stopped
+            covered.update(pd.date_range(first, min(chunk_last, today - timedelta(days=1)), freq='D').date)
+            _write_covered(ticker_dir, covered)
+            first = chunk_last + timedelta(days=1)
+    return rows
+
+
+def ingest_many(client, tickers, start, end, base_dir=INGEST_DIR, max_workers=TICKER_WORKERS):
+    """{ticker: bars written} for several tickers, ingested concurrently."""
+    tickers = list(dict.fromkeys(tickers))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers)))) as executor:
+        counts = executor.map(lambda ticker: ingest(client, ticker, start, end, base_dir), tickers)
+        return dict(zip(tickers, counts))
+
+
+def query(ticker, start, end, columns=None, base_dir=INGEST_DIR):
+    """Minute bars from `start` to `end` (inclusive dates), reading only those days' partitions."""
+    ticker_dir = _ticker_dir(ticker, base_dir)
+    columns = columns or SCHEMA.names
+    if not os.path.isdir(ticker_dir):
+        return SCHEMA.empty_table().select(columns).to_pandas()
+    dataset = ds.dataset(ticker_dir, format='parquet', schema=DATASET_SCHEMA, partitioning=PARTITIONING,
+                         ignore_prefixes=['.', '_', COVERED_FILE])
+    days = (ds.field('date') >= pd.Timestamp(start).date().isoformat()) & \
+           (ds.field('date') <= pd.Timestamp(end).date().isoformat())
+    table = dataset.to_table(columns=columns, filter=days)
+    return table.to_pandas().sort_values('t', ignore_index=True) if 't' in columns else table.to_pandas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest Polygon minute bars into day-partitioned Parquet")
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--start', required=True)
+    parser.add_argument('--end', default=pd.Timestamp.now().strftime('%Y-%m-%d'))
+    parser.add_argument('--dir', default=INGEST_DIR)
+    args = parser.parse_args()
+
+    client = PolygonClient()
+    started = time.perf_counter()
+    counts = ingest_many(client, args.tickers, args.start, args.end, args.dir)
+    for ticker, rows in counts.items():
+        print(f"{ticker}: {rows:,} bars written")
+    print(f"Done in {time.perf_counter() - started:.1f}s -> {args.dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,40 +1,82 @@
 import streamlit as st
-import requests
-import pandas as pd
 import plotly.express as px
 from datetime import datetime, timedelta
+from plotly.subplots import make_subplots
+from chart_utils import line_trace
+from perf import StageTimer
+from polygon_client import PolygonClient
+from polygon_ingest import ingest_many, query
 
-# Set your Polygon.io API key here
-API_KEY = 'DCgGFNX2zT9ir2qeZycNgr9aQ0d6JfXl'
+TICKERS = ["I:SPX", "I:VIX"]
 
-# Function to get data from Polygon.io
-def get_polygon_data(ticker, start_date, end_date):
-    url = f"https://api.polygon.io/v2/aggs/ticker/{ticker}/range/1/day/{start_date}/{end_date}?apiKey={API_KEY}"
-    response = requests.get(url)
-    data = response.json()
-    return data['results']
+# One client per server process: a shared keep-alive session and on-disk cache of fetched days
+# (API key from POLYGON_API_KEY in the environment or Streamlit secrets)
+@st.cache_resource
+def get_client():
+    return PolygonClient()
+
+def client_or_stop():
+    try:
+        return get_client()
+    except RuntimeError as e:
+        st.error(str(e))
+        st.stop()
 
 # Streamlit app
 st.title("SPX and VIX Data Visualization")
 
+resolution = st.sidebar.radio("Resolution", ["Daily", "Minute"],
+                              help="Minute bars are ingested into day-partitioned Parquet; only the days in the window are read back.")
+
 # Date inputs
 start_date = st.date_input("Start date", datetime.now() - timedelta(days=30))
 end_date = st.date_input("End date", datetime.now())
 
+timer = StageTimer("polygonbpi.py")
+
+# Minute mode: ingest the date range once, then read back only the window on screen
+if resolution == "Minute":
+    if st.button("Ingest Minute Bars"):
+        client = client_or_stop()
+        with timer.stage("ingest"):
+            with st.spinner("Ingesting minute bars..."):
+                counts = ingest_many(client, TICKERS, start_date, end_date)
+        st.caption("Bars written: " + ", ".join(f"{ticker} {rows:,}" for ticker, rows in counts.items()))
+
+    if start_date < end_date:
+        window = st.slider("Window", min_value=start_date, max_value=end_date,
+                           value=(max(start_date, end_date - timedelta(days=5)), end_date))
+    else:
+        window = (start_date, end_date)
+    with timer.stage("query"):
+        spx_df, vix_df = (query(ticker, *window, columns=['t', 'c']) for ticker in TICKERS)
+    if spx_df.empty and vix_df.empty:
+        st.info("No minute bars stored for this window yet. Ingest the date range first.")
+        st.stop()
+
+    with timer.stage("figure"):
+        fig = make_subplots(specs=[[{"secondary_y": True}]])
+        fig.add_trace(line_trace(spx_df['t'], spx_df['c'], name='SPX'), secondary_y=False)
+        fig.add_trace(line_trace(vix_df['t'], vix_df['c'], name='VIX'), secondary_y=True)
+        fig.update_layout(title=f"SPX and VIX Minute Closes ({len(spx_df):,} / {len(vix_df):,} bars, UTC)")
+        fig.update_yaxes(title_text="SPX", secondary_y=False)
+        fig.update_yaxes(title_text="VIX", secondary_y=True, showgrid=False)
+    with timer.stage("render"):
+        st.plotly_chart(fig)
+    st.stop()
+
 # Fetch data
 if st.button("Fetch Data"):
-    spx_data = get_polygon_data("I:SPX", start_date, end_date)
-    vix_data = get_polygon_data("I:VIX", start_date, end_date)
-
-    # Convert to DataFrame
-    spx_df = pd.DataFrame(spx_data)
-    vix_df = pd.DataFrame(vix_data)
+    client = client_or_stop()
 
-    # Convert timestamps to datetime
-    spx_df['t'] = pd.to_datetime(spx_df['t'], unit='ms')
-    vix_df['t'] = pd.to_datetime(vix_df['t'], unit='ms')
+    # Both tickers concurrently; days fetched before are read from the cache
+    with timer.stage("fetch"):
+        bars = client.get_many(TICKERS, start_date, end_date)
+    spx_df, vix_df = bars["I:SPX"], bars["I:VIX"]
 
     # Plot data
-    fig = px.line(spx_df, x='t', y='c', title='SPX Closing Prices')
-    fig.add_scatter(x=vix_df['t'], y=vix_df['c'], mode='lines', name='VIX Closing Prices')
-    st.plotly_chart(fig)
+    with timer.stage("figure"):
+        fig = px.line(spx_df, x='t', y='c', title='SPX Closing Prices')
+        fig.add_scatter(x=vix_df['t'], y=vix_df['c'], mode='lines', name='VIX Closing Prices')
+    with timer.stage("render"):
+        st.plotly_chart(fig)
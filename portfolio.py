@@ -0,0 +1,122 @@
+"""
+Cross-sectional portfolio backtest over a whole ticker universe.
+
+Prices are aligned into (time, tickers) matrices once; signals, weights,
+rebalancing, turnover and per-ticker contributions are then computed with
+matrix operations, so the cost grows with the number of cells rather than
+with a per-ticker Python loop.
+"""
+
+import numpy as np
+import pandas as pd
+
+from backtest_engine import matrix_signals, positions_from_signals
+
+REBALANCE_FREQUENCIES = {"Daily": None, "Weekly": "W", "Monthly": "M"}
+
+
+def price_matrices(frames):
+    """
+    Aligns {ticker: OHLC DataFrame} into High/Low/Close DataFrames (dates x tickers).
+
+    Gaps after a ticker's first bar are forward-filled; dates before it stay NaN.
+    """
+    matrices = {}
+    for col in ('High', 'Low', 'Close'):
+        matrix = pd.concat({ticker: frame[col] for ticker, frame in frames.items() if not frame.empty}, axis=1)
+        matrices[col] = matrix.sort_index().ffill()
+    return matrices
+
+
+def _rebalance_rows(index, frequency):
+    """Rows that start a new calendar period (every row for daily rebalancing)."""
+    flags = np.ones(len(index), dtype=bool)
+    if frequency is not None and len(index):
+        periods = pd.DatetimeIndex(index).to_period(frequency)
+        flags[1:] = periods[1:] != periods[:-1]
+    return flags
+
+
+def target_weights(positions, strength, allocation):
+    """Equal weight across active positions, or weight proportional to positive signal strength."""
+    active = positions > 0
+    if allocation == "Signal-weighted":
+        scores = np.where(active, np.clip(np.nan_to_num(strength), 0.0, None), 0.0)
+        totals = scores.sum(axis=1, keepdims=True)
+        # Fall back to equal weights on days where every active signal has zero strength
+        scores = np.where(totals > 0, scores, active.astype('float64'))
+    else:
+        scores = active.astype('float64')
+    totals = scores.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(totals > 0, scores / totals, 0.0)
+
+
+def backtest_portfolio(high, low, close, indicator, params, allocation="Equal weight", rebalance="Monthly"):
+    """
+    Runs one indicator strategy on every ticker and combines them into a long-only portfolio.
+
+    Weights are set at the close of each rebalance day (calendar period start, or any day the
+    set of active positions changes) and drift with prices in between. Returns a dict with the
+    daily `equity` and `benchmark` (daily-rebalanced equal weight) series, the `turnover` per
+    rebalance, per-ticker `contributions` to total return, and the final `weights`.
+    """
+    tickers, index = close.columns, close.index
+    close_values = close.to_numpy(dtype='float64')
+    buy, sell, strength = matrix_signals(indicator, high.to_numpy(dtype='float64'), low.to_numpy(dtype='float64'),
+                                         close_values, params)
+    positions = positions_from_signals(buy, sell)
+    n_rows = len(index)
+    rows = np.arange(n_rows)
+
+    returns = np.zeros_like(close_values)
+    returns[1:] = np.nan_to_num(close_values[1:] / close_values[:-1] - 1)
+    growth = np.cumprod(1 + returns, axis=0)
+
+    membership_changed = np.ones(n_rows, dtype=bool)
+    membership_changed[1:] = (positions[1:] != positions[:-1]).any(axis=1)
+    rebalance_rows = _rebalance_rows(index, REBALANCE_FREQUENCIES[rebalance]) | membership_changed
+    weights = target_weights(positions, strength, allocation)
+
+    # Each row is held with the weights set at the most recent rebalance strictly before it
+    last_rebalance = np.maximum.accumulate(np.where(rebalance_rows, rows, 0))
+    held_from = np.concatenate([[0], last_rebalance[:-1]])
+    held_weights = weights[held_from]
+    relative_growth = growth / growth[held_from]
+    invested = (held_weights * relative_growth).sum(axis=1)
+    segment_value = invested + (1 - held_weights.sum(axis=1))
+    segment_value[0] = 1.0
+
+    # Value one row earlier within the same holding period (1.0 right after a rebalance)
+    previous_value = np.ones(n_rows)
+    same_segment = held_from[1:] == held_from[:-1]
+    previous_value[1:] = np.where(same_segment, segment_value[:-1], 1.0)
+    portfolio_returns = segment_value / previous_value - 1
+    equity = np.cumprod(1 + portfolio_returns)
+
+    # Drifted weights just before each day's return, used for turnover and attribution
+    previous_growth = np.ones_like(growth)
+    previous_growth[1:] = np.where(same_segment[:, None], growth[:-1] / growth[held_from[1:]], 1.0)
+    drifted = held_weights * previous_growth / previous_value[:, None]
+    contributions = (drifted * returns * np.concatenate([[1.0], equity[:-1]])[:, None]).sum(axis=0)
+
+    # Turnover at a rebalance: half the absolute change from the drifted to the target weights
+    end_of_day = held_weights * relative_growth / segment_value[:, None]
+    end_of_day[0] = 0.0
+    turnover = np.abs(weights - end_of_day).sum(axis=1) / 2
+    turnover = pd.Series(turnover[rebalance_rows], index=index[rebalance_rows])
+
+    # Benchmark: equal weight across the tickers trading that day, rebalanced daily
+    listed = ~np.isnan(close_values)
+    listed[1:] &= ~np.isnan(close_values[:-1])
+    listed_count = listed.sum(axis=1)
+    benchmark_returns = np.where(listed, returns, 0.0).sum(axis=1) / np.maximum(listed_count, 1)
+    benchmark = pd.Series(np.cumprod(1 + benchmark_returns), index=index)
+    return {
+        'equity': pd.Series(equity, index=index),
+        'benchmark': benchmark,
+        'turnover': turnover[turnover > 0],
+        'contributions': pd.Series(contributions, index=tickers).sort_values(ascending=False),
+        'weights': pd.Series(weights[-1], index=tickers),
+        'positions': pd.DataFrame(positions, index=index, columns=tickers),
+    }
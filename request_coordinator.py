@@ -0,0 +1,54 @@
+"""
+Per-cycle coordinator for broker API reads.
+
+A RequestCoordinator wraps a REST client for the duration of one bot cycle. It
+exposes the same methods as the client, so the bot's helpers take it in place of
+the client. Within the cycle, identical read calls (same method and arguments)
+are sent once and share the response. Reads can be started early with prefetch(),
+so independent requests overlap on the client's pooled HTTP session instead of
+running one after another. Every request's latency is recorded. Anything other
+than a read (orders) goes straight to the client, uncached.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+READ_METHODS = {'get_account', 'get_position', 'get_crypto_bars'}
+REQUEST_WORKERS = 4
+
+_pool = ThreadPoolExecutor(max_workers=REQUEST_WORKERS, thread_name_prefix='broker-request')
+
+
+class RequestCoordinator:
+    """Deduplicates and overlaps the read calls made against `api` during one cycle."""
+
+    def __init__(self, api, executor=_pool):
+        self.api = api
+        self.latencies = {}
+        self._executor = executor
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, method, *args, **kwargs):
+        """Starts a read in the background (or joins the identical one already started)."""
+        key = (method, args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                future = self._executor.submit(self._timed, method, args, kwargs)
+                self._futures[key] = future
+        return future
+
+    def _timed(self, method, args, kwargs):
+        started = time.perf_counter()
+        try:
+            return getattr(self.api, method)(*args, **kwargs)
+        finally:
+            self.latencies[method] = time.perf_counter() - started
+
+    def __getattr__(self, name):
+        if name not in READ_METHODS:
+            return getattr(self.api, name)
+        # Errors (e.g. "position does not exist") are re-raised to every caller, like a direct call
+        return lambda *args, **kwargs: self.prefetch(name, *args, **kwargs).result()
@@ -1,16 +1,15 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import pwlf
 import plotly.graph_objects as go
-import plotly.figure_factory as ff
+from plotly.subplots import make_subplots
+from scipy.stats import gaussian_kde
+from chart_utils import line_trace
+from ohlcv_store import load_ohlcv
+from segmentation import fit_windows
+from perf import StageTimer
 
-# Function to perform piecewise linear regression
-def perform_pwlf(x, y, num_segments):
-    model = pwlf.PiecewiseLinFit(x, y)
-    model.fit(num_segments)
-    return model.fit_breaks, model.slopes
+ENGINES = {"Exact (breakpoint search)": "exact", "pwlf (differential evolution)": "pwlf"}
 
 # Function to calculate slope changes
 def calculate_slope_changes(slopes):
@@ -22,58 +21,88 @@ st.title("SPX Piecewise Linear Regression Analysis")
 # Sidebar for user input
 window_size = st.sidebar.number_input("Rolling Window Size (days)", min_value=5, max_value=21, value=9)
 num_segments = st.sidebar.number_input("Number of Segments", min_value=2, max_value=3, value=2)
+engine = st.sidebar.radio("Fitting Engine", list(ENGINES),
+                          help="The exact search is deterministic and much faster; pwlf runs a global optimizer per window.")
+start_date = st.sidebar.date_input("Start Date", pd.to_datetime("2023-02-01"))
+end_date = st.sidebar.date_input("End Date", pd.to_datetime("2023-04-01"))
+
+timer = StageTimer("rolling_piecewise_fit.py")
 
 # Fetch SPX data
-spx_data = yf.download("^GSPC", start="2023-02-01", end="2023-04-01")
-spx_data.reset_index(inplace=True)
+with timer.stage("fetch"):
+    spx_data = load_ohlcv("^GSPC", start=start_date, end=end_date)
+    spx_data.reset_index(inplace=True)
+
+if len(spx_data) < window_size:
+    st.warning(f"Only {len(spx_data)} trading days between {start_date} and {end_date}; "
+               f"pick a range of at least {window_size} trading days (the rolling window size).")
+    st.stop()
 
 # Prepare data for analysis
-x = (spx_data['Date'] - spx_data['Date'].min()).dt.days.values
-y = spx_data['Close'].values
+with timer.stage("compute"):
+    x = (spx_data['Date'] - spx_data['Date'].min()).dt.days.values
+    y = spx_data['Close'].values
 
-# Perform rolling window analysis
-results = []
-all_breakpoints = []
-all_slope_changes = []
+    # Perform rolling window analysis (fits run in a process pool and are cached on disk)
+    results = []
+    all_breakpoints = []
+    all_slope_changes = []
 
-for i in range(len(spx_data) - window_size + 1):
-    window_x = x[i:i+window_size]
-    window_y = y[i:i+window_size]
-    
-    breaks, slopes = perform_pwlf(window_x, window_y, num_segments)
-    slope_changes = calculate_slope_changes(slopes)
+    with st.spinner("Fitting rolling windows..."):
+        fits = fit_windows(x, y, window_size, num_segments, ENGINES[engine])
+
+    for i, fit in enumerate(fits):
+        breaks, slopes = fit.fit_breaks, fit.slopes
+        slope_changes = calculate_slope_changes(slopes)
     
-    results.append({
-        'Window Start': spx_data['Date'].iloc[i],
-        'Window End': spx_data['Date'].iloc[i+window_size-1],
-        'Breakpoints': breaks[1:-1],
-        'Slopes': slopes
-    })
+        results.append({
+            'Window Start': spx_data['Date'].iloc[i],
+            'Window End': spx_data['Date'].iloc[i+window_size-1],
+            'Breakpoints': breaks[1:-1],
+            'Slopes': slopes
+        })
     
-    all_breakpoints.extend(breaks[1:-1])
-    all_slope_changes.extend(slope_changes)
+        all_breakpoints.extend(breaks[1:-1])
+        all_slope_changes.extend(slope_changes)
 
 # Create summary table
-summary_df = pd.DataFrame(results)
-st.subheader("Summary Table")
-st.dataframe(summary_df)
+with timer.stage("table"):
+    summary_df = pd.DataFrame(results)
+    st.subheader("Summary Table")
+    st.dataframe(summary_df)
 
 # Create histogram of slope changes
-st.subheader("Histogram of Slope Changes")
-fig = ff.create_distplot([all_slope_changes], ['Slope Changes'], bin_size=0.01)
-st.plotly_chart(fig)
+with timer.stage("histogram"):
+    st.subheader("Histogram of Slope Changes")
+    if all_slope_changes:
+        # Density histogram with a KDE curve (figure_factory.create_distplot is gone from plotly 6+)
+        fig = go.Figure(go.Histogram(x=all_slope_changes, xbins=dict(size=0.01), histnorm='probability density',
+                                     name='Slope Changes', opacity=0.7))
+        if len(all_slope_changes) > 1 and np.ptp(all_slope_changes) > 0:
+            grid = np.linspace(min(all_slope_changes), max(all_slope_changes), 200)
+            fig.add_trace(go.Scatter(x=grid, y=gaussian_kde(all_slope_changes)(grid), mode='lines', name='Density'))
+        fig.update_layout(xaxis_title="Slope Change", yaxis_title="Density")
+        st.plotly_chart(fig)
+    else:
+        st.info("No slope changes to plot.")
 
-# Plot SPX time-series with breakpoints
-st.subheader("SPX Time-series with Breakpoints")
-fig = go.Figure()
+# Plot SPX time-series with breakpoints binned per day into a single density trace,
+# so the chart costs the same to draw however many windows there are
+with timer.stage("figure"):
+    st.subheader("SPX Time-series with Breakpoints")
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
 
-fig.add_trace(go.Scatter(x=spx_data['Date'], y=spx_data['Close'], mode='lines', name='SPX'))
+    fig.add_trace(line_trace(spx_data['Date'], spx_data['Close'], name='SPX'), secondary_y=False)
 
-for bp in all_breakpoints:
-    bp_date = spx_data['Date'].min() + pd.Timedelta(days=round(bp))
-    fig.add_vline(x=bp_date, line_dash="dash", line_color="red", opacity=0.2)
+    breakpoint_counts = np.bincount(np.rint(all_breakpoints).astype(int)) if all_breakpoints else np.zeros(0, dtype=int)
+    breakpoint_days = np.flatnonzero(breakpoint_counts)
+    fig.add_trace(go.Bar(x=spx_data['Date'].min() + pd.to_timedelta(breakpoint_days, unit='D'), y=breakpoint_counts[breakpoint_days],
+                         name='Breakpoints', marker_color='red', opacity=0.35), secondary_y=True)
 
-fig.update_layout(xaxis_title="Date", yaxis_title="SPX Close Price")
-st.plotly_chart(fig)
+    fig.update_layout(xaxis_title="Date", bargap=0)
+    fig.update_yaxes(title_text="SPX Close Price", secondary_y=False)
+    fig.update_yaxes(title_text="Breakpoints per Day", secondary_y=True, showgrid=False)
+with timer.stage("render"):
+    st.plotly_chart(fig)
 
-st.write("Note: Red dashed lines represent breakpoints from all rolling windows.")
+st.write("Note: Red bars count the breakpoints from all rolling windows that fall on each day.")
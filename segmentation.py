@@ -0,0 +1,280 @@
+"""
+Exact continuous piecewise-linear segmentation for short series.
+
+pwlf.PiecewiseLinFit.fit() searches breakpoints with differential evolution,
+which is slow and not deterministic. For the short rolling windows used in
+rolling_piecewise_fit.py the optimum can be found exactly instead.
+
+In an optimal continuous fit every breakpoint either sits on a data point or
+strictly inside the gap between two neighbouring points. Inside a gap no point
+changes side, so the lines on either side can be fitted independently and the
+breakpoint is their intersection (Hudson's method). fit_piecewise enumerates
+every such placement, solves all of the resulting least-squares problems in one
+batch, drops placements whose intersections fall outside their gap and keeps
+the smallest residual. The result has the same fit_breaks / slopes / intercepts
+layout as a fitted pwlf model.
+"""
+
+import hashlib
+import os
+import sqlite3
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+PiecewiseFit = namedtuple('PiecewiseFit', ['fit_breaks', 'slopes', 'intercepts', 'ssr'])
+MAX_BATCH_CELLS = 2_000_000   # placements x points solved per batch; bounds the design stack in memory
+FIT_CACHE_PATH = os.environ.get("SEGMENTATION_CACHE_PATH", os.path.join(".cache", "segmentation", "fits.sqlite"))
+# Uncached windows needed before a process pool pays for its start-up, per engine
+PARALLEL_THRESHOLD = {"exact": 2000, "pwlf": 4}
+
+
+@lru_cache(maxsize=64)
+def _placements(n_points, num_segments):
+    """
+    All breakpoint placements for n_points and num_segments, as (join_index, is_free) arrays.
+
+    Placements are positions on a doubled grid: 2i is data point i (interior only) and
+    2i + 1 is the open gap between points i and i + 1.
+    """
+    positions = range(1, 2 * n_points - 2)
+    placements = list(combinations(positions, num_segments - 1))
+    joins = np.array(placements, dtype=int).reshape(len(placements), num_segments - 1)
+    is_free = joins % 2 == 1
+    return joins // 2, is_free
+
+
+def _design(x, join_index, is_free, num_segments):
+    """
+    Stacked design matrices (placements x points x columns).
+
+    Points are split into groups at free breakpoints; each group gets its own intercept and
+    slope column plus a hinge column for every data-point breakpoint inside it. Columns that
+    a placement does not use are left at zero.
+    """
+    n_points = len(x)
+    t = np.arange(n_points)
+    # Group of each point: number of free breakpoints strictly to its left
+    group = ((t[None, None, :] > join_index[:, :, None]) & is_free[:, :, None]).sum(axis=1)
+    join_group = np.cumsum(is_free, axis=1) - is_free
+    hinge = np.maximum(x[None, None, :] - x[join_index][:, :, None], 0.0)
+    hinge *= (~is_free)[:, :, None] & (group[:, None, :] == join_group[:, :, None])
+
+    groups = np.arange(num_segments)
+    in_group = (group[:, :, None] == groups).astype('float64')
+    return np.concatenate([in_group, in_group * x[None, :, None], hinge.transpose(0, 2, 1)], axis=2), group, join_group
+
+
+def _best_placement(xs, y, join_index, is_free, num_segments):
+    """Solves a batch of placements; returns (ssr, breaks, slopes, intercepts) of the best feasible one, or None."""
+    n_points = len(xs)
+    design, group, join_group = _design(xs, join_index, is_free, num_segments)
+
+    # Every group needs at least as many points as it has parameters
+    fixed = ~is_free
+    groups = np.arange(num_segments)
+    group_points = (group[:, :, None] == groups).sum(axis=1)
+    group_joins = (fixed[:, :, None] & (join_group[:, :, None] == groups)).sum(axis=1)
+    group_used = groups[None, :] <= is_free.sum(axis=1, keepdims=True)
+    solvable = np.all(~group_used | (group_points >= 2 + group_joins), axis=1)
+    # and a data-point breakpoint must have neighbours on both sides within its group
+    rows = np.arange(len(group))[:, None]
+    same_side = (group[rows, join_index - 1] == group[rows, join_index]) & (group[rows, join_index + 1] == group[rows, join_index])
+    solvable &= np.all(is_free | same_side, axis=1)
+    if not solvable.any():
+        return None
+    design, join_index, is_free, join_group = design[solvable], join_index[solvable], is_free[solvable], join_group[solvable]
+    fixed = ~is_free
+
+    # Normal equations, with unused columns pinned to zero through an identity on their diagonal
+    unused = np.concatenate([~group_used[solvable], ~group_used[solvable], is_free], axis=1)
+    gram = np.einsum('mti,mtj->mij', design, design) + unused[:, :, None] * np.eye(design.shape[2])
+    coefs = np.linalg.solve(gram, np.einsum('mti,t->mi', design, y)[:, :, None])[:, :, 0]
+    ssr = ((design @ coefs[:, :, None])[:, :, 0] - y) ** 2
+    ssr = ssr.sum(axis=1)
+
+    # Segment lines, left to right: group base line, bent by each data-point breakpoint in turn
+    intercept = coefs[:, :num_segments]
+    slope = coefs[:, num_segments:2 * num_segments]
+    hinge = coefs[:, 2 * num_segments:]
+    rows = np.arange(len(coefs))
+    seg_slopes = np.empty((len(coefs), num_segments))
+    seg_intercepts = np.empty((len(coefs), num_segments))
+    breaks = np.empty((len(coefs), num_segments - 1))
+    current_slope = slope[:, 0].copy()
+    current_intercept = intercept[:, 0].copy()
+    feasible = np.ones(len(coefs), dtype=bool)
+    for j in range(num_segments - 1):
+        seg_slopes[:, j], seg_intercepts[:, j] = current_slope, current_intercept
+        at_point = xs[join_index[:, j]]
+        next_group = join_group[:, j] + 1
+        next_slope = np.where(fixed[:, j], current_slope + hinge[:, j], slope[rows, np.minimum(next_group, num_segments - 1)])
+        next_intercept = np.where(fixed[:, j], current_intercept - hinge[:, j] * at_point,
+                                  intercept[rows, np.minimum(next_group, num_segments - 1)])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing = (next_intercept - current_intercept) / (current_slope - next_slope)
+        # A free breakpoint is only valid where the two lines actually meet inside its gap
+        gap_end = xs[np.minimum(join_index[:, j] + 1, n_points - 1)]
+        inside = (crossing >= at_point) & (crossing <= gap_end)
+        feasible &= fixed[:, j] | inside
+        breaks[:, j] = np.where(fixed[:, j], at_point, crossing)
+        current_slope, current_intercept = next_slope, next_intercept
+    seg_slopes[:, -1], seg_intercepts[:, -1] = current_slope, current_intercept
+    feasible &= np.all(np.diff(breaks, axis=1) >= 0, axis=1)
+    if not feasible.any():
+        return None
+
+    best = np.flatnonzero(feasible)[np.argmin(ssr[feasible])]
+    return ssr[best], breaks[best], seg_slopes[best], seg_intercepts[best]
+
+
+def fit_piecewise(x, y, num_segments):
+    """
+    Least-squares continuous piecewise-linear fit with the globally optimal breakpoints.
+
+    Returns PiecewiseFit(fit_breaks, slopes, intercepts, ssr), where fit_breaks includes the
+    first and last x like pwlf's, and each segment is y = slopes[i] * x + intercepts[i].
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    order = np.argsort(x, kind='stable')
+    x, y = x[order], y[order]
+    n_points = len(x)
+    if n_points < num_segments + 1:
+        raise ValueError(f"Need at least {num_segments + 1} points for {num_segments} segments")
+
+    # Shift x to start at zero so the hinge columns stay well conditioned
+    origin = x[0]
+    xs = x - origin
+    join_index, is_free = _placements(n_points, num_segments)
+    # Solve placements in batches so long series don't build one huge design stack
+    batch = max(1, MAX_BATCH_CELLS // n_points)
+    best = None
+    for start in range(0, len(join_index), batch):
+        candidate = _best_placement(xs, y, join_index[start:start + batch], is_free[start:start + batch], num_segments)
+        if candidate is not None and (best is None or candidate[0] < best[0]):
+            best = candidate
+    ssr, breaks, slopes, intercepts = best
+    fit_breaks = np.concatenate([[0.0], breaks, [xs[-1]]]) + origin
+    # Intercepts back in the caller's x coordinates
+    return PiecewiseFit(fit_breaks, slopes, intercepts - slopes * origin, float(ssr))
+
+
+def fit_pwlf(x, y, num_segments):
+    """The same fit through pwlf's differential-evolution search (slower, not deterministic)."""
+    import pwlf
+
+    model = pwlf.PiecewiseLinFit(x, y)
+    model.fit(num_segments)
+    return PiecewiseFit(model.fit_breaks, model.slopes, model.intercepts, float(model.ssr))
+
+
+ENGINES = {"exact": fit_piecewise, "pwlf": fit_pwlf}
+
+
+# --- Rolling windows: disk cache and process pool ---
+
+def _window_key(x, y, num_segments, engine):
+    """Hash of a window's data with x measured from the window start, so shifted copies share a key."""
+    digest = hashlib.sha256(f"{engine}:{num_segments}:{len(x)}".encode())
+    digest.update(np.ascontiguousarray(x - x[0], dtype='float64').tobytes())
+    digest.update(np.ascontiguousarray(y, dtype='float64').tobytes())
+    return digest.hexdigest()
+
+
+def _open_cache(cache_path):
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    connection = sqlite3.connect(cache_path, timeout=30)
+    connection.execute("CREATE TABLE IF NOT EXISTS fits (key TEXT PRIMARY KEY, fit_breaks BLOB, slopes BLOB, "
+                       "intercepts BLOB, ssr REAL)")
+    return connection
+
+
+def _read_cached(connection, keys):
+    cached = {}
+    unique_keys = list(dict.fromkeys(keys))
+    for start in range(0, len(unique_keys), 500):
+        batch = unique_keys[start:start + 500]
+        query = f"SELECT key, fit_breaks, slopes, intercepts, ssr FROM fits WHERE key IN ({','.join('?' * len(batch))})"
+        for key, fit_breaks, slopes, intercepts, ssr in connection.execute(query, batch):
+            cached[key] = PiecewiseFit(np.frombuffer(fit_breaks), np.frombuffer(slopes), np.frombuffer(intercepts), ssr)
+    return cached
+
+
+def _write_cached(connection, fits):
+    with connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO fits VALUES (?, ?, ?, ?, ?)",
+            [(key, fit.fit_breaks.tobytes(), fit.slopes.tobytes(), fit.intercepts.tobytes(), fit.ssr)
+             for key, fit in fits.items()])
+
+
+def _fit_relative(args):
+    """Fits one window with x measured from its first point (what the cache stores)."""
+    x, y, num_segments, engine = args
+    fit = ENGINES[engine](x - x[0], y, num_segments)
+    return PiecewiseFit(*(np.asarray(part, dtype='float64') for part in fit[:3]), float(fit.ssr))
+
+
+def _shift(fit, origin):
+    return PiecewiseFit(fit.fit_breaks + origin, fit.slopes, fit.intercepts - fit.slopes * origin, fit.ssr)
+
+
+def fit_windows(x, y, window_size, num_segments, engine="exact", cache_path=FIT_CACHE_PATH, max_workers=None,
+                parallel_threshold=None):
+    """
+    Fits every rolling window of (x, y); returns one PiecewiseFit per window, in window order.
+
+    Fits are cached in a SQLite file keyed by the window's data and num_segments, so windows
+    seen before (in any date range) are not refit. Windows that are not cached are spread over
+    a process pool once there are enough of them; pass cache_path=None to skip the cache.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    if len(x) < window_size:
+        return []
+    windows_x = sliding_window_view(x, window_size)
+    windows_y = sliding_window_view(y, window_size)
+    keys = [_window_key(wx, wy, num_segments, engine) for wx, wy in zip(windows_x, windows_y)]
+
+    connection = _open_cache(cache_path) if cache_path else None
+    try:
+        fits = _read_cached(connection, keys) if connection else {}
+        missing = {}
+        for i, key in enumerate(keys):
+            if key not in fits and key not in missing:
+                missing[key] = (windows_x[i], windows_y[i], num_segments, engine)
+
+        if parallel_threshold is None:
+            parallel_threshold = PARALLEL_THRESHOLD.get(engine, 1)
+        tasks = list(missing.values())
+        workers = max_workers or os.cpu_count() or 1
+        if len(tasks) >= parallel_threshold and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                computed = list(executor.map(_fit_relative, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+        else:
+            computed = [_fit_relative(task) for task in tasks]
+        new_fits = dict(zip(missing, computed))
+        if connection and new_fits:
+            _write_cached(connection, new_fits)
+        fits.update(new_fits)
+    finally:
+        if connection:
+            connection.close()
+    return [_shift(fits[key], origin) for key, origin in zip(keys, windows_x[:, 0])]
+
+
+def fit_cached(x, y, num_segments, engine="exact", cache_path=FIT_CACHE_PATH):
+    """A single disk-cached fit over the whole series."""
+    return fit_windows(x, y, len(x), num_segments, engine, cache_path)[0]
+
+
+def predict(fit, x):
+    """Evaluates a PiecewiseFit at x."""
+    x = np.asarray(x, dtype='float64')
+    segment = np.clip(np.searchsorted(fit.fit_breaks, x, side='right') - 1, 0, len(fit.slopes) - 1)
+    return fit.slopes[segment] * x + fit.intercepts[segment]
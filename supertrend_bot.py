@@ -0,0 +1,337 @@
+"""
+SuperTrend BTC trading bot: the trading cycle and the background worker that runs it.
+
+The worker is a daemon thread that calls run_bot_cycle every POLL_INTERVAL_SECONDS,
+independently of any Streamlit session, and publishes its state through a
+thread-safe BotState. alpaca_supertrend.py holds one worker per server process and
+only reads that state, so trading keeps going when browser tabs disconnect and any
+number of viewers can watch the same bot.
+"""
+
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import pandas as pd
+from alpaca_trade_api.rest import TimeFrame
+
+from request_coordinator import RequestCoordinator
+from indicators import true_range, average_true_range, supertrend_bands, StreamingSuperTrend
+from trade_log import append_row
+
+# --- Configuration ---
+SYMBOL = "BTC/USD"
+TIMEFRAME = TimeFrame.Minute
+LOOKBACK_PERIODS = 100
+SUPERTREND_PERIOD = 7
+SUPERTREND_MULTIPLIER = 3
+ORDER_SIZE_BTC = 1.0 # Consider making this a secret or input if variable
+POLL_INTERVAL_SECONDS = 60 # Interval between bot cycles
+LOG_DIR = 'trading_log' # Daily Parquet segments written by trade_log
+
+# --- Helper Functions (Adapted from main.py) ---
+
+def _naive_utc(timestamp):
+    timestamp = pd.Timestamp(timestamp)
+    return (timestamp.tz_convert('UTC').tz_localize(None) if timestamp.tzinfo else timestamp).to_pydatetime()
+
+def get_current_position_details(api):
+    """Gets the current position quantity and unrealized PnL."""
+    if api is None: return None, None
+    position_symbol = SYMBOL.replace('/', '')
+    qty = 0.0; unrealized_pl = 0.0
+    try:
+        position = api.get_position(position_symbol)
+        qty = float(position.qty)
+        unrealized_pl = float(position.unrealized_pl)
+        if position.side != 'long': qty = 0.0; unrealized_pl = 0.0
+        return qty, unrealized_pl
+    except Exception as e:
+        error_str = str(e).lower()
+        if "position does not exist" in error_str or "404 client error" in error_str or "not found" in error_str:
+             return 0.0, 0.0
+        else:
+            print(f"Error getting position details for {position_symbol}: {e}")
+            return None, None
+
+def get_account_details(api):
+    """Gets current account equity, cash, and buying power."""
+    if api is None: return None, None, None
+    try:
+        account = api.get_account()
+        equity = float(account.equity)
+        cash = float(account.cash)
+        buying_power = float(account.buying_power)
+        return equity, cash, buying_power
+    except Exception as e:
+        print(f"Error getting account details: {e}")
+        return None, None, None
+
+def get_data(api, since=None, now=None):
+    """
+    Fetches historical data for the symbol; with `since`, only the bars after that timestamp.
+    `now` (default: the wall clock) lets a replay run the bot on simulated time.
+    """
+    if api is None: return None
+    try:
+        now = datetime.utcnow() if now is None else _naive_utc(now)
+        start_dt = now - timedelta(minutes=LOOKBACK_PERIODS * 2 + 10)
+        if since is not None:
+            since = pd.Timestamp(since)
+            start_dt = _naive_utc(since)
+        end_dt = now - timedelta(minutes=1)
+        start_iso = start_dt.isoformat() + "Z"; end_iso = end_dt.isoformat() + "Z"
+        bars = api.get_crypto_bars(SYMBOL, TIMEFRAME, start=start_iso, end=end_iso).df
+        if bars.empty: return None
+        if 'exchange' in bars.columns:
+            bars_filtered = bars[bars.exchange == 'CBSE']
+            if not bars_filtered.empty: bars = bars_filtered
+        if bars.empty: return None
+        bars.columns = map(str.lower, bars.columns)
+        rename_map = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+        bars.rename(columns=rename_map, inplace=True)
+        required_cols = ['Open', 'High', 'Low', 'Close', 'Volume']
+        if not all(col in bars.columns for col in required_cols): return None
+        bars.index = pd.to_datetime(bars.index); bars.sort_index(inplace=True)
+        if since is not None:
+            bars = bars[bars.index > since]
+            return bars if not bars.empty else None
+        if len(bars) < LOOKBACK_PERIODS: return None
+        return bars
+    except Exception as e:
+        print(f"Error fetching/processing data: {e}")
+        return None
+
+def tr(data):
+    if not all(col in data.columns for col in ['High', 'Low', 'Close']): return None
+    return pd.Series(true_range(data['High'], data['Low'], data['Close']), index=data.index)
+
+def atr(data, period):
+    if not all(col in data.columns for col in ['High', 'Low', 'Close']) or len(data) < period: return None
+    return pd.Series(average_true_range(data['High'], data['Low'], data['Close'], period), index=data.index)
+
+def supertrend(df, period=SUPERTREND_PERIOD, atr_multiplier=SUPERTREND_MULTIPLIER):
+    """Thin DataFrame adapter over indicators.supertrend_bands; drops the bars that have no ATR yet."""
+    if df is None or df.empty: return None
+    if not all(col in df.columns for col in ['High', 'Low', 'Close']): return None
+    if len(df) < period: return None
+    atr_values, upperband, lowerband, in_uptrend = supertrend_bands(df['High'], df['Low'], df['Close'], period, atr_multiplier)
+    df = df.copy()
+    df['atr'] = atr_values; df['upperband'] = upperband; df['lowerband'] = lowerband; df['in_uptrend'] = in_uptrend
+    df = df.iloc[period - 1:]
+    if df.empty: return None
+    return df
+
+def check_signals_and_trade(api, df, current_qty):
+    if api is None: return "Hold (Error)"
+    print("Checking for buy/sell signals...")
+    if df is None or len(df) < 2: return "Hold"
+    last_row = df.iloc[-1]; prev_row = df.iloc[-2]
+    signal_action = "Hold"; order_symbol = SYMBOL.replace('/', '')
+    print(f"Supertrend - Previous: {'Uptrend' if prev_row['in_uptrend'] else 'Downtrend'}, Current: {'Uptrend' if last_row['in_uptrend'] else 'Downtrend'}")
+    print(f"Current Position: {current_qty} {order_symbol}")
+    is_long = current_qty > 1e-9; is_flat = not is_long
+    trend_flipped_up = (not prev_row['in_uptrend'] and last_row['in_uptrend'])
+    trend_flipped_down = (prev_row['in_uptrend'] and not last_row['in_uptrend'])
+    print(f"Debug Check: FlippedUp={trend_flipped_up}, FlippedDown={trend_flipped_down}, IsLong={is_long}, IsFlat={is_flat}")
+    try:
+        if trend_flipped_up:
+            print("Signal: Uptrend detected.")
+            if is_flat:
+                print(f"Action: Buying {ORDER_SIZE_BTC} {order_symbol}")
+                api.submit_order(symbol=order_symbol, qty=ORDER_SIZE_BTC, side='buy', type='market', time_in_force='gtc')
+                signal_action = "Buy"
+            else: print("Action: Already Long, Holding."); signal_action = "Hold"
+        elif trend_flipped_down:
+            print("Signal: Downtrend detected.")
+            if is_long:
+                close_qty = abs(current_qty)
+                print(f"Action: Selling {close_qty} {order_symbol} to close position.")
+                api.submit_order(symbol=order_symbol, qty=close_qty, side='sell', type='market', time_in_force='gtc')
+                signal_action = "Sell"
+            else: print("Action: Already Flat, Holding."); signal_action = "Hold"
+        else: print("Signal: No trend change detected. Holding."); signal_action = "Hold"
+    except Exception as e: print(f"Error submitting order: {e}"); signal_action = "Hold (Error)"
+    return signal_action
+
+def log_data(timestamp, price, trend_status, upper_band, lower_band, holding_qty, market_value, cash, equity, transaction, cumulative_pnl, minutely_pnl, unrealized_pnl, cumulative_realized_pnl, net_liquidation_value, log_dir=LOG_DIR):
+    log_entry = {'Timestamp': timestamp, 'Price': price, 'Trend': trend_status, 'UpperBand': upper_band, 'LowerBand': lower_band, 'HoldingQty': holding_qty, 'MarketValue': market_value, 'Cash': cash, 'Equity': equity, 'Transaction': transaction, 'CumulativePnL': cumulative_pnl, 'MinutelyPnL': minutely_pnl, 'UnrealizedPnL': unrealized_pnl, 'CumulativeRealizedPnL': cumulative_realized_pnl, 'NetLiquidationValue': net_liquidation_value}
+    if log_dir is None: return # Replays can run without a log
+    try: append_row(log_dir, log_entry)
+    except Exception as e: print(f"Error logging data: {e}")
+
+def run_bot_cycle(api, current_run_state, now=None, log_dir=LOG_DIR):
+    """
+    One trading cycle: fold in new bars, trade on a trend flip, log the row. Returns the next run state.
+    `now` (default: the wall clock) and `log_dir` let paper_broker.replay run cycles on simulated time.
+    """
+    local_initial_equity = current_run_state.get('initial_equity')
+    local_previous_minute_equity = current_run_state.get('previous_minute_equity')
+    local_cumulative_realized_pnl = current_run_state.get('cumulative_realized_pnl', 0.0)
+    local_previous_minute_unrealized_pnl = current_run_state.get('previous_minute_unrealized_pnl', 0.0)
+    print("-" * 30); print(f"Running cycle at {datetime.now().isoformat()}")
+    if api is None: print("API object is None..."); return current_run_state
+    cycle_started = time.perf_counter()
+    # Account and position do not depend on the bars: request them now so all three overlap,
+    # and let every later call in this cycle reuse the same responses
+    cycle_requests = RequestCoordinator(api)
+    cycle_requests.prefetch('get_account'); cycle_requests.prefetch('get_position', SYMBOL.replace('/', ''))
+    indicator = current_run_state.get('supertrend_state')
+    now_utc = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(_naive_utc(now), tz='UTC')
+    if indicator is not None and indicator.last_timestamp < now_utc - timedelta(minutes=LOOKBACK_PERIODS):
+        print("Indicator state is stale, reseeding from full lookback..."); indicator = None
+    if indicator is None:
+        df_raw = get_data(cycle_requests, now=now)
+        if df_raw is None or df_raw.empty: print("Failed to get data..."); return current_run_state
+        indicator = StreamingSuperTrend(SUPERTREND_PERIOD, SUPERTREND_MULTIPLIER, history=LOOKBACK_PERIODS)
+    else:
+        # Only the bars since the last cycle are requested and folded into the indicator state
+        df_raw = get_data(cycle_requests, since=indicator.last_timestamp, now=now)
+    if df_raw is None or df_raw.empty:
+        # Minute bars can arrive late: still refresh the account and log a row, only skip the signal check
+        new_bars = 0; print("No new bars since last cycle, keeping the current SuperTrend state...")
+    else:
+        new_bars = indicator.ingest(df_raw); print(f"Ingested {new_bars} new bar(s) up to {indicator.last_timestamp}")
+    df_supertrend = indicator.to_frame()
+    if df_supertrend is None or df_supertrend.empty: print("Failed to calculate Supertrend..."); return current_run_state
+    last_row = df_supertrend.iloc[-1]; current_price = last_row['Close']; current_time = datetime.now() if now is None else _naive_utc(now)
+    api_equity, api_cash, api_buying_power = get_account_details(cycle_requests)
+    current_position_qty, api_unrealized_pnl = get_current_position_details(cycle_requests)
+    if api_equity is None or api_cash is None or current_position_qty is None or api_unrealized_pnl is None:
+        print("Failed to get account/position details..."); return current_run_state
+    market_value = current_position_qty * current_price; calculated_equity = api_cash + market_value
+    if local_initial_equity is None:
+        local_initial_equity = calculated_equity; print(f"Initial equity set (calculated): {local_initial_equity}")
+        local_previous_minute_equity = calculated_equity; local_previous_minute_unrealized_pnl = api_unrealized_pnl
+    cumulative_pnl = calculated_equity - local_initial_equity
+    minutely_pnl = calculated_equity - local_previous_minute_equity if local_previous_minute_equity is not None else 0
+    minutely_realized_pnl = 0.0
+    if local_previous_minute_equity is not None:
+        change_in_calculated_equity = calculated_equity - local_previous_minute_equity
+        change_in_api_unrealized_pnl = api_unrealized_pnl - local_previous_minute_unrealized_pnl
+        minutely_realized_pnl = change_in_calculated_equity - change_in_api_unrealized_pnl
+        local_cumulative_realized_pnl += minutely_realized_pnl
+    transaction_type = check_signals_and_trade(api, df_supertrend, current_position_qty) if new_bars else "Hold"
+    signal_seconds = time.perf_counter() - cycle_started
+    print(f"Debug Latency: Signal decided after {signal_seconds:.3f}s, requests={cycle_requests.latencies}")
+    print(f"Debug API State: API Equity={api_equity}, API Cash={api_cash}, API Unrealized PnL={api_unrealized_pnl}")
+    print(f"Debug Calculated: Market Value={market_value}, Calculated Equity={calculated_equity}")
+    print(f"Debug PnL: Prev Calc Equity={local_previous_minute_equity}, Minutely Total PnL (Calc)={minutely_pnl}")
+    print(f"Debug Realized PnL: Minutely={minutely_realized_pnl}, Cumulative={local_cumulative_realized_pnl}")
+    log_data(timestamp=current_time, price=current_price, trend_status='Uptrend' if last_row['in_uptrend'] else 'Downtrend', upper_band=last_row['upperband'], lower_band=last_row['lowerband'], holding_qty=current_position_qty, market_value=market_value, cash=api_cash, equity=calculated_equity, transaction=transaction_type, cumulative_pnl=cumulative_pnl, minutely_pnl=minutely_pnl, unrealized_pnl=api_unrealized_pnl, cumulative_realized_pnl=local_cumulative_realized_pnl, net_liquidation_value=calculated_equity, log_dir=log_dir)
+    updated_run_state = {'initial_equity': local_initial_equity, 'previous_minute_equity': calculated_equity, 'cumulative_realized_pnl': local_cumulative_realized_pnl, 'previous_minute_unrealized_pnl': api_unrealized_pnl, 'equity': api_equity, 'cash': api_cash, 'buying_power': api_buying_power, 'position_qty': current_position_qty, 'unrealized_pnl': api_unrealized_pnl, 'market_value': market_value, 'account_status': cycle_requests.get_account().status, 'supertrend_state': indicator, 'signal_seconds': signal_seconds, 'request_latency': dict(cycle_requests.latencies)}
+    print(f"Cycle complete at {datetime.now().isoformat()}"); print("-" * 30)
+    return updated_run_state
+
+def close_position_on_exit(api):
+    print("\nAttempting to close open position before exiting...")
+    if api is None: print("API not connected."); return
+    current_qty, _ = get_current_position_details(api)
+    order_symbol = SYMBOL.replace('/', '')
+    if current_qty is not None and current_qty > 1e-9:
+        side_to_close = 'sell'; qty_to_close = abs(current_qty)
+        print(f"Current position: {current_qty}. Submitting market {side_to_close} order for {qty_to_close} {order_symbol}...")
+        try:
+            api.submit_order(symbol=order_symbol, qty=qty_to_close, side=side_to_close, type='market', time_in_force='gtc')
+            print("Position closing order submitted."); time.sleep(5)
+        except Exception as e: print(f"Error submitting closing order: {e}")
+    elif current_qty == 0.0: print("No open position to close.")
+    else: print(f"Could not determine position or position is not long ({current_qty}). No close action taken.")
+    print("Position closing attempt finished.")
+
+# --- Background Worker ---
+
+DEFAULT_STATE = {
+    'running': False, 'api_connected': False, 'status_message': "Idle", 'last_run_time': None,
+    'last_cycle_seconds': None, 'cycles': 0, 'error': None,
+    'initial_equity': None, 'previous_minute_equity': None, 'cumulative_realized_pnl': 0.0,
+    'previous_minute_unrealized_pnl': 0.0, 'equity': 0.0, 'cash': 0.0, 'buying_power': 0.0,
+    'position_qty': 0.0, 'unrealized_pnl': 0.0, 'market_value': 0.0,
+    'account_status': "Disconnected", 'supertrend_state': None, 'signal_seconds': None, 'request_latency': {}
+}
+# The part of the state that run_bot_cycle carries from one cycle to the next
+RUN_STATE_KEYS = ['initial_equity', 'previous_minute_equity', 'cumulative_realized_pnl',
+                  'previous_minute_unrealized_pnl', 'supertrend_state']
+
+
+class BotState:
+    """Thread-safe store for the bot state: written by the worker, read by every viewer."""
+
+    def __init__(self, **values):
+        self._values = dict(DEFAULT_STATE, **values)
+        self._lock = threading.Lock()
+
+    def update(self, **values):
+        with self._lock:
+            self._values.update(values)
+
+    def snapshot(self):
+        """A consistent copy of the whole state."""
+        with self._lock:
+            return dict(self._values)
+
+
+class TradingWorker:
+    """Runs run_bot_cycle every `interval` seconds on a daemon thread until stopped."""
+
+    def __init__(self, interval=POLL_INTERVAL_SECONDS):
+        self.interval = interval
+        self.state = BotState()
+        self.api = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # Held for a whole cycle, so a restarted worker never overlaps the previous one's orders
+        self._cycle_lock = threading.Lock()
+
+    def connect(self, api):
+        """Attaches a connected REST client and records the account's current state."""
+        connect_requests = RequestCoordinator(api)
+        connect_requests.prefetch('get_position', SYMBOL.replace('/', ''))
+        equity, cash, buying_power = get_account_details(connect_requests)
+        qty, unrealized_pl = get_current_position_details(connect_requests)
+        if equity is None or qty is None: raise RuntimeError("Failed to fetch account details after connection.")
+        self.api = api
+        self.state.update(api_connected=True, equity=equity, cash=cash, buying_power=buying_power, position_qty=qty,
+                          unrealized_pnl=unrealized_pl, account_status=connect_requests.get_account().status,
+                          status_message="Connected. Fetched initial state.")
+
+    def start(self):
+        """Starts trading; returns False if not connected or already running."""
+        with self._lock:
+            if self.api is None or self.state.snapshot()['running']: return False
+            self._stop = threading.Event()
+            self.state.update(running=True, error=None, status_message="Bot Started. Running first cycle...")
+            threading.Thread(target=self._run, args=(self._stop,), name='supertrend-bot', daemon=True).start()
+            return True
+
+    def stop(self):
+        """Stops after the current cycle (if one is in flight); never blocks the caller."""
+        with self._lock:
+            self._stop.set()
+            self.state.update(running=False, status_message="Bot Stopped.")
+
+    def close_position(self):
+        """Closes the open position, after the cycle in flight (if any) has finished."""
+        with self._cycle_lock:
+            close_position_on_exit(self.api)
+
+    def _run(self, stop):
+        while not stop.is_set():
+            started = time.monotonic()
+            with self._cycle_lock:
+                if stop.is_set(): return
+                try:
+                    snapshot = self.state.snapshot()
+                    updated_state = run_bot_cycle(self.api, {key: snapshot[key] for key in RUN_STATE_KEYS})
+                    self.state.update(**updated_state, cycles=snapshot['cycles'] + 1, last_run_time=datetime.now(),
+                                      last_cycle_seconds=time.monotonic() - started)
+                    # A stop during the cycle keeps its "Bot Stopped." message
+                    if not stop.is_set(): self.state.update(status_message="Running.")
+                except Exception as e:
+                    print(traceback.format_exc())
+                    if not stop.is_set():
+                        self.state.update(running=False, status_message=f"Error during cycle: {e}", error=traceback.format_exc())
+                    return
+            # Cycles start every `interval` seconds however long each one took
+            stop.wait(max(self.interval - (time.monotonic() - started), 0))
@@ -0,0 +1,202 @@
+"""
+Segmented trading log for the SuperTrend bot.
+
+Rows are stored as typed Parquet segments, one file per calendar day
+(LOG_DIR/YYYY-MM-DD.parquet). Each append writes only its own small part file
+(LOG_DIR/YYYY-MM-DD.parts/NNNNNN.parquet). A day's parts are compacted into its
+segment when the day rolls over, or once COMPACT_PARTS of them have piled up,
+so an append never rewrites the day on every call. "Last N rows" / "rows since T"
+only open the files they need, so read cost no longer grows with the whole history.
+
+Import an existing CSV log with:
+    python trade_log.py import trading_log_streamlit.csv --log-dir trading_log
+"""
+
+import argparse
+import glob
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+LOG_COLUMNS = ['Timestamp', 'Price', 'Trend', 'UpperBand', 'LowerBand', 'HoldingQty', 'MarketValue', 'Cash', 'Equity',
+               'Transaction', 'CumulativePnL', 'MinutelyPnL', 'UnrealizedPnL', 'CumulativeRealizedPnL', 'NetLiquidationValue']
+LOG_SCHEMA = pa.schema(
+    [pa.field('Timestamp', pa.timestamp('us'))]
+    + [pa.field(col, pa.string()) if col in ('Trend', 'Transaction') else pa.field(col, pa.float64())
+       for col in LOG_COLUMNS[1:]]
+)
+
+COMPACT_PARTS = 60   # an open day's parts are merged into its segment at this count
+
+_log_lock = threading.Lock()   # appends and compaction; reads take it too, so they never see a half-compacted day
+
+
+def _segment_path(log_dir, day):
+    return os.path.join(log_dir, f"{day:%Y-%m-%d}.parquet")
+
+
+def _parts_dir(log_dir, day):
+    return os.path.join(log_dir, f"{day:%Y-%m-%d}.parts")
+
+
+def _part_paths(parts_dir):
+    return sorted(glob.glob(os.path.join(parts_dir, "??????.parquet")))
+
+
+def list_segments(log_dir):
+    """
+    Data files (day segments and not yet compacted parts), oldest first.
+
+    Names sort chronologically: YYYY-MM-DD.parquet, then YYYY-MM-DD.parts/*, then the next day.
+    """
+    return sorted(glob.glob(os.path.join(log_dir, "????-??-??.parquet"))
+                  + glob.glob(os.path.join(log_dir, "????-??-??.parts", "??????.parquet")))
+
+
+def _to_table(df):
+    df = df[LOG_COLUMNS].copy()
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    return pa.Table.from_pandas(df, schema=LOG_SCHEMA, preserve_index=False)
+
+
+def _write_segment(path, table):
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)  # readers never see a partially written segment
+
+
+def _compact_day(log_dir, day):
+    """Merges a day's parts into its segment. Caller holds _log_lock."""
+    parts_dir = _parts_dir(log_dir, day)
+    parts = _part_paths(parts_dir)
+    if not parts:
+        return
+    path = _segment_path(log_dir, day)
+    existing = [path] if os.path.exists(path) else []
+    _write_segment(path, pa.concat_tables([pq.read_table(p, schema=LOG_SCHEMA) for p in existing + parts]))
+    for part in parts:
+        os.remove(part)
+    os.rmdir(parts_dir)
+
+
+def _pending_days(log_dir):
+    return [pd.Timestamp(os.path.basename(d)[:10]) for d in sorted(glob.glob(os.path.join(log_dir, "????-??-??.parts")))]
+
+
+def compact(log_dir):
+    """Merges the parts of every day, including the current one, into their segments."""
+    with _log_lock:
+        for day in _pending_days(log_dir):
+            _compact_day(log_dir, day)
+
+
+def append_rows(log_dir, rows):
+    """Appends a DataFrame (or list of row dicts) of log rows as a new part file per day."""
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return
+    table = _to_table(df)
+    days = table.column('Timestamp').to_pandas().dt.normalize()
+    os.makedirs(log_dir, exist_ok=True)
+    with _log_lock:
+        for day in days.unique():
+            parts_dir = _parts_dir(log_dir, day)
+            os.makedirs(parts_dir, exist_ok=True)
+            parts = _part_paths(parts_dir)
+            number = int(os.path.basename(parts[-1])[:6]) + 1 if parts else 0
+            _write_segment(os.path.join(parts_dir, f"{number:06d}.parquet"), table.filter(pa.array((days == day).to_numpy())))
+            if len(parts) + 1 >= COMPACT_PARTS:
+                _compact_day(log_dir, day)
+        # Day rollover: earlier days are complete, so fold their parts into one segment each
+        for day in _pending_days(log_dir):
+            if day < days.max():
+                _compact_day(log_dir, day)
+
+
+def append_row(log_dir, row):
+    """Appends a single log row dict."""
+    append_rows(log_dir, [row])
+
+
+def _empty_log():
+    return LOG_SCHEMA.empty_table().to_pandas()
+
+
+def read_tail(log_dir, n):
+    """Returns the last `n` rows, reading segments newest-first until enough rows are found."""
+    tables = []
+    rows = 0
+    with _log_lock:
+        for path in reversed(list_segments(log_dir)):
+            table = pq.read_table(path, schema=LOG_SCHEMA)
+            tables.append(table)
+            rows += table.num_rows
+            if rows >= n:
+                break
+    if not tables:
+        return _empty_log()
+    df = pa.concat_tables(reversed(tables)).to_pandas()
+    return df.tail(n).reset_index(drop=True)
+
+
+def read_since(log_dir, since):
+    """Returns all rows with Timestamp >= since, opening only the files from that day on."""
+    since = pd.Timestamp(since)
+    first_path = _segment_path(log_dir, since.normalize())
+    with _log_lock:
+        paths = [path for path in list_segments(log_dir) if path >= first_path]
+        tables = [pq.read_table(path, schema=LOG_SCHEMA, filters=[('Timestamp', '>=', since)]) for path in paths]
+    if not tables:
+        return _empty_log()
+    return pa.concat_tables(tables).to_pandas().reset_index(drop=True)
+
+
+def read_last_hours(log_dir, hours):
+    """Rows within `hours` of the newest row in the log."""
+    last_row = read_tail(log_dir, 1)
+    if last_row.empty:
+        return last_row
+    return read_since(log_dir, last_row['Timestamp'].iloc[-1] - pd.Timedelta(hours=hours))
+
+
+def import_csv(csv_path, log_dir, chunksize=100_000):
+    """Imports a CSV log (the format written by earlier versions of the bot). Returns the row count."""
+    imported = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        chunk = chunk.sort_values('Timestamp', kind='stable')
+        append_rows(log_dir, chunk)
+        imported += len(chunk)
+    compact(log_dir)
+    return imported
+
+
+def migrate_csv(csv_path, log_dir):
+    """One-time migration: imports `csv_path` if it exists and the segmented log is still empty."""
+    if list_segments(log_dir) or not os.path.exists(csv_path):
+        return 0
+    return import_csv(csv_path, log_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Segmented trading log tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="import a CSV trading log")
+    import_parser.add_argument('csv_path')
+    import_parser.add_argument('--log-dir', default='trading_log')
+    tail_parser = subparsers.add_parser('tail', help="print the last rows of the log")
+    tail_parser.add_argument('-n', type=int, default=20)
+    tail_parser.add_argument('--log-dir', default='trading_log')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        count = import_csv(args.csv_path, args.log_dir)
+        print(f"Imported {count} rows into {len(list_segments(args.log_dir))} segments in {args.log_dir}")
+    elif args.command == 'tail':
+        print(read_tail(args.log_dir, args.n).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
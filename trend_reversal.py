@@ -9,15 +9,16 @@ This Streamlit app:
 """
 
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import numpy as np
+from ohlcv_store import load_ohlcv
+from perf import StageTimer
 
 # Function to download SPX data
 def get_spx_data(start_date, end_date):
-    return yf.download('^GSPC', start=start_date, end=end_date, interval='1d')
+    return load_ohlcv('^GSPC', start_date, end_date, interval='1d')
 
 # Function to plot candlestick chart
 def plot_candlestick(data, reversals_up, reversals_down):
@@ -72,20 +73,27 @@ end_date = st.sidebar.date_input('End Date', datetime.now())
 reversal_methods = ['Moving Average Crossover', 'RSI']
 selected_method = st.sidebar.selectbox('Select Reversal Detection Method', reversal_methods)
 
+timer = StageTimer("trend_reversal.py")
+
 # Download data
-spx_data = get_spx_data(start_date, end_date)
+with timer.stage("fetch"):
+    spx_data = get_spx_data(start_date, end_date)
 
 # Detect reversals
-reversals_up, reversals_down = detect_reversals(spx_data, selected_method)
+with timer.stage("compute"):
+    reversals_up, reversals_down = detect_reversals(spx_data, selected_method)
 
 # Plot chart
-chart = plot_candlestick(spx_data, reversals_up, reversals_down)
-st.plotly_chart(chart, use_container_width=True)
+with timer.stage("figure"):
+    chart = plot_candlestick(spx_data, reversals_up, reversals_down)
+with timer.stage("render"):
+    st.plotly_chart(chart, use_container_width=True)
 
 # Summary table
-st.subheader('Trend Reversal Summary')
-summary_data = pd.concat([
-    reversals_up[['Close']].rename(columns={'Close': 'Uptrend Reversal Price'}),
-    reversals_down[['Close']].rename(columns={'Close': 'Downtrend Reversal Price'})
-]).sort_index()
-st.table(summary_data)
+with timer.stage("table"):
+    st.subheader('Trend Reversal Summary')
+    summary_data = pd.concat([
+        reversals_up[['Close']].rename(columns={'Close': 'Uptrend Reversal Price'}),
+        reversals_down[['Close']].rename(columns={'Close': 'Downtrend Reversal Price'})
+    ]).sort_index()
+    st.table(summary_data)
@@ -11,19 +11,18 @@ This Streamlit app:
 """
 
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 from datetime import datetime, timedelta
+from ohlcv_store import load_ohlcv
+from perf import StageTimer
 
 # Function to download SPX data
 @st.cache_data
 def get_spx_data(start_date, end_date):
-    spx = yf.Ticker("^GSPC")
-    data = spx.history(start=start_date, end=end_date)
-    return data
+    return load_ohlcv("^GSPC", start_date, end_date)
 
 # Function to create candlestick chart
 def plot_candlestick(data):
@@ -102,38 +101,45 @@ elif selected_method == "RSI":
     params = {'window': window, 'oversold': oversold, 'overbought': overbought}
 # Add more parameter settings for other methods
 
+timer = StageTimer("trend_reversal1.py")
+
 # Main app
-data = get_spx_data(start_date, end_date)
+with timer.stage("fetch"):
+    data = get_spx_data(start_date, end_date)
 
 # Calculate indicator
-data = calculate_indicator(data, selected_method, params)
+with timer.stage("compute"):
+    data = calculate_indicator(data, selected_method, params)
 
-# Detect reversals
-reversals = detect_reversals(data, selected_method, params)
+    # Detect reversals
+    reversals = detect_reversals(data, selected_method, params)
 
 # Plot candlestick chart
-fig = plot_candlestick(data)
-
-# Add indicator to the chart
-if selected_method == "Moving Average Crossover":
-    fig.add_trace(go.Scatter(x=data.index, y=data['MA_short'], name='Short MA'))
-    fig.add_trace(go.Scatter(x=data.index, y=data['MA_long'], name='Long MA'))
-elif selected_method == "RSI":
-    fig.add_trace(go.Scatter(x=data.index, y=data['RSI'], name='RSI', yaxis="y2"))
-    fig.update_layout(yaxis2=dict(title="RSI", overlaying="y", side="right"))
-
-# Add reversal markers
-for date, direction in reversals:
-    fig.add_annotation(x=date, y=data.loc[date, 'High'] if direction == 'Downtrend' else data.loc[date, 'Low'],
-                       text='⬇' if direction == 'Downtrend' else '⬆',
-                       showarrow=False)
-
-st.plotly_chart(fig, use_container_width=True)
+with timer.stage("figure"):
+    fig = plot_candlestick(data)
+
+    # Add indicator to the chart
+    if selected_method == "Moving Average Crossover":
+        fig.add_trace(go.Scatter(x=data.index, y=data['MA_short'], name='Short MA'))
+        fig.add_trace(go.Scatter(x=data.index, y=data['MA_long'], name='Long MA'))
+    elif selected_method == "RSI":
+        fig.add_trace(go.Scatter(x=data.index, y=data['RSI'], name='RSI', yaxis="y2"))
+        fig.update_layout(yaxis2=dict(title="RSI", overlaying="y", side="right"))
+
+    # Add reversal markers
+    for date, direction in reversals:
+        fig.add_annotation(x=date, y=data.loc[date, 'High'] if direction == 'Downtrend' else data.loc[date, 'Low'],
+                           text='⬇' if direction == 'Downtrend' else '⬆',
+                           showarrow=False)
+
+with timer.stage("render"):
+    st.plotly_chart(fig, use_container_width=True)
 
 # Summarize reversals in a table
-if reversals:
-    st.subheader('Trend Reversals')
-    reversal_df = pd.DataFrame(reversals, columns=['Date', 'Direction'])
-    st.table(reversal_df)
-else:
-    st.write('No trend reversals detected in the selected time range.')
+with timer.stage("table"):
+    if reversals:
+        st.subheader('Trend Reversals')
+        reversal_df = pd.DataFrame(reversals, columns=['Date', 'Direction'])
+        st.table(reversal_df)
+    else:
+        st.write('No trend reversals detected in the selected time range.')
@@ -0,0 +1,94 @@
+"""
+Small thread-safe time-to-live cache for network lookups shared across apps.
+
+Unlike st.cache_data it can be used from worker threads and plain scripts.
+Concurrent callers asking for the same missing key wait for a single load
+instead of each starting their own request.
+
+Expired entries are dropped when they are looked up, and all of them are swept
+at most once per TTL, so keys that are never asked for again do not pile up.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+
+class TTLCache:
+    """Maps keys to values that expire `ttl` seconds after they were loaded."""
+
+    def __init__(self, ttl, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = {}
+        self._loading = {}  # key -> Future of the load in progress, removed when it finishes
+        self._lock = threading.Lock()
+        self._last_sweep = clock()
+
+    def _fresh(self, key, now):
+        """The entry for `key` if it has not expired; an expired one is dropped. Caller holds _lock."""
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[0] >= self.ttl:
+            del self._entries[key]
+            return None
+        return entry
+
+    def _sweep(self, now):
+        """Drops every expired entry, at most once per TTL. Caller holds _lock."""
+        if now - self._last_sweep < self.ttl:
+            return
+        self._entries = {key: entry for key, entry in self._entries.items() if now - entry[0] < self.ttl}
+        self._last_sweep = now
+
+    def get(self, key, load):
+        """Returns the cached value for `key`, calling `load()` if it is missing or expired."""
+        return self.get_future(key, load).result()
+
+    def get_future(self, key, load, submit=None):
+        """
+        A Future for the value of `key`.
+
+        A cached value comes back already resolved, and a load still in progress is shared
+        rather than started again. Otherwise `load` is started through `submit(fn)` (e.g.
+        an executor's submit) or, by default, run inline.
+        """
+        with self._lock:
+            now = self.clock()
+            self._sweep(now)
+            entry = self._fresh(key, now)
+            if entry is not None:
+                future = Future()
+                future.set_result(entry[1])
+                return future
+            if key in self._loading:
+                return self._loading[key]
+            future = self._loading[key] = Future()
+
+        def run():
+            try:
+                value = load()
+            except BaseException as error:
+                with self._lock:
+                    del self._loading[key]
+                future.set_exception(error)
+                return
+            with self._lock:
+                self._entries[key] = (self.clock(), value)
+                del self._loading[key]
+            future.set_result(value)
+
+        try:
+            (submit or (lambda fn: fn()))(run)
+        except BaseException as error:  # e.g. the executor is shutting down
+            with self._lock:
+                self._loading.pop(key, None)
+            future.set_exception(error)
+        return future
+
+    def invalidate(self, key=None):
+        """Drops one key, or every entry when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
@@ -8,10 +8,14 @@ The app uses interactive charts and does not rely on regularMarketPrice.
 """
 
 import streamlit as st
-import yfinance as yf
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from black_scholes import RISK_FREE_RATE
+from option_chains import get_chains, get_spot, nearest_expiration
+from vol_surface import get_surface
+from perf import StageTimer
 
 # Function to get next Friday
 def get_next_friday(date):
@@ -31,50 +35,97 @@ st.title("Option Chain Analyzer")
 
 # Sidebar inputs
 ticker = st.sidebar.text_input("Enter Ticker", value="AAPL")
+view = st.sidebar.radio("View", ["Two expirations", "IV surface"])
+
+timer = StageTimer("twooptionsapp2.py")
+
+# Surface mode: every listed expiration, solved and gridded (cached for a couple of minutes)
+if view == "IV surface":
+    moneyness_range = st.sidebar.slider("Moneyness range (strike / spot)", 0.5, 1.5, (0.8, 1.2), 0.05)
+    max_tenor = st.sidebar.slider("Max tenor (years)", 0.1, 3.0, 2.0, 0.1)
+    risk_free_rate = st.sidebar.number_input("Risk-free rate (%)", 0.0, 20.0, RISK_FREE_RATE * 100, 0.25) / 100
+    with timer.stage("surface"):
+        with st.spinner("Building volatility surface..."):
+            surface = get_surface(ticker, risk_free_rate, moneyness_range, max_tenor)
+    points, moneyness, tenor, iv = surface['points'], surface['moneyness'], surface['tenor'], surface['iv']
+    if len(tenor) == 0:
+        st.warning(f"No usable option quotes for {ticker}.")
+        st.stop()
+    st.caption(f"{len(points):,} contracts across {points['expiration'].nunique()} expirations")
+
+    with timer.stage("figure"):
+        fig_surface = go.Figure(go.Surface(x=moneyness, y=tenor * 365, z=iv, colorscale='Viridis'))
+        fig_surface.update_layout(title=f'{ticker} Implied Volatility Surface', height=650,
+                                  scene=dict(xaxis_title='Moneyness (K/S)', yaxis_title='Days to Expiry', zaxis_title='IV'))
+    with timer.stage("render"):
+        st.plotly_chart(fig_surface, use_container_width=True)
+
+    # Smile slices at a few tenors, term structure at a few moneyness levels
+    with timer.stage("smile"):
+        fig_smile = go.Figure()
+        for row in np.unique(np.linspace(0, len(tenor) - 1, 4).astype(int)):
+            fig_smile.add_trace(go.Scatter(x=moneyness, y=iv[row], mode='lines', name=f'{tenor[row] * 365:.0f} days'))
+        fig_smile.update_layout(title='Volatility Smile', xaxis_title='Moneyness (K/S)', yaxis_title='IV')
+        st.plotly_chart(fig_smile)
+
+    with timer.stage("term"):
+        fig_term = go.Figure()
+        for level in (0.9, 1.0, 1.1):
+            if moneyness[0] <= level <= moneyness[-1]:
+                column = np.abs(moneyness - level).argmin()
+                fig_term.add_trace(go.Scatter(x=tenor * 365, y=iv[:, column], mode='lines+markers', name=f'{moneyness[column]:.2f} K/S'))
+        fig_term.update_layout(title='Term Structure', xaxis_title='Days to Expiry', yaxis_title='IV')
+        st.plotly_chart(fig_term)
+    st.stop()
+
 today = datetime.now().date()
 exp_date1 = st.sidebar.date_input("First Expiration Date", value=get_next_friday(today))
 exp_date2 = st.sidebar.date_input("Second Expiration Date", value=get_next_friday(today + timedelta(days=7)))
 
 # Download data
-stock = yf.Ticker(ticker)
-current_price = stock.history(period="1d")['Close'].iloc[-1]
+with timer.stage("fetch"):
+    current_price = get_spot(ticker)
 
-# Get option chains
-options1 = stock.option_chain(exp_date1.strftime('%Y-%m-%d'))
-options2 = stock.option_chain(exp_date2.strftime('%Y-%m-%d'))
+    # Get both option chains concurrently (snapped to listed expirations)
+    exp_date1 = nearest_expiration(ticker, exp_date1)
+    exp_date2 = nearest_expiration(ticker, exp_date2)
+    chains = get_chains(ticker, [exp_date1, exp_date2])
 
 # Calculate strike range
-lower_strike = current_price * 0.9
-upper_strike = current_price * 1.1
+with timer.stage("compute"):
+    lower_strike = current_price * 0.9
+    upper_strike = current_price * 1.1
 
-# Process call options
-calls1 = calculate_option_values(options1.calls, True, current_price)
-calls2 = calculate_option_values(options2.calls, True, current_price)
-calls1 = calls1[(calls1['strike'] >= lower_strike) & (calls1['strike'] <= upper_strike)]
-calls2 = calls2[(calls2['strike'] >= lower_strike) & (calls2['strike'] <= upper_strike)]
+    # Process call options
+    calls1 = calculate_option_values(chains[exp_date1][0], True, current_price)
+    calls2 = calculate_option_values(chains[exp_date2][0], True, current_price)
+    calls1 = calls1[(calls1['strike'] >= lower_strike) & (calls1['strike'] <= upper_strike)]
+    calls2 = calls2[(calls2['strike'] >= lower_strike) & (calls2['strike'] <= upper_strike)]
 
-# Process put options
-puts1 = calculate_option_values(options1.puts, False, current_price)
-puts2 = calculate_option_values(options2.puts, False, current_price)
-puts1 = puts1[(puts1['strike'] >= lower_strike) & (puts1['strike'] <= upper_strike)]
-puts2 = puts2[(puts2['strike'] >= lower_strike) & (puts2['strike'] <= upper_strike)]
+    # Process put options
+    puts1 = calculate_option_values(chains[exp_date1][1], False, current_price)
+    puts2 = calculate_option_values(chains[exp_date2][1], False, current_price)
+    puts1 = puts1[(puts1['strike'] >= lower_strike) & (puts1['strike'] <= upper_strike)]
+    puts2 = puts2[(puts2['strike'] >= lower_strike) & (puts2['strike'] <= upper_strike)]
 
 # Create call options chart
-fig_calls = go.Figure()
-fig_calls.add_trace(go.Scatter(x=calls1['strike'], y=calls1['midPrice'], mode='lines+markers', name=f'Mid Price ({exp_date1})'))
-fig_calls.add_trace(go.Scatter(x=calls1['strike'], y=calls1['intrinsicValue'], mode='lines+markers', name=f'Intrinsic Value ({exp_date1})'))
-fig_calls.add_trace(go.Scatter(x=calls2['strike'], y=calls2['midPrice'], mode='lines+markers', name=f'Mid Price ({exp_date2})'))
-fig_calls.add_trace(go.Scatter(x=calls2['strike'], y=calls2['intrinsicValue'], mode='lines+markers', name=f'Intrinsic Value ({exp_date2})'))
-fig_calls.update_layout(title='Call Options', xaxis_title='Strike Price', yaxis_title='Price')
-
-# Create put options chart
-fig_puts = go.Figure()
-fig_puts.add_trace(go.Scatter(x=puts1['strike'], y=puts1['midPrice'], mode='lines+markers', name=f'Mid Price ({exp_date1})'))
-fig_puts.add_trace(go.Scatter(x=puts1['strike'], y=puts1['intrinsicValue'], mode='lines+markers', name=f'Intrinsic Value ({exp_date1})'))
-fig_puts.add_trace(go.Scatter(x=puts2['strike'], y=puts2['midPrice'], mode='lines+markers', name=f'Mid Price ({exp_date2})'))
-fig_puts.add_trace(go.Scatter(x=puts2['strike'], y=puts2['intrinsicValue'], mode='lines+markers', name=f'Intrinsic Value ({exp_date2})'))
-fig_puts.update_layout(title='Put Options', xaxis_title='Strike Price', yaxis_title='Price')
+with timer.stage("figure"):
+    fig_calls = go.Figure()
+    fig_calls.add_trace(go.Scatter(x=calls1['strike'], y=calls1['midPrice'], mode='lines+markers', name=f'Mid Price ({exp_date1})'))
+    fig_calls.add_trace(go.Scatter(x=calls1['strike'], y=calls1['intrinsicValue'], mode='lines+markers', name=f'Intrinsic Value ({exp_date1})'))
+    fig_calls.add_trace(go.Scatter(x=calls2['strike'], y=calls2['midPrice'], mode='lines+markers', name=f'Mid Price ({exp_date2})'))
+    fig_calls.add_trace(go.Scatter(x=calls2['strike'], y=calls2['intrinsicValue'], mode='lines+markers', name=f'Intrinsic Value ({exp_date2})'))
+    fig_calls.update_layout(title='Call Options', xaxis_title='Strike Price', yaxis_title='Price')
+
+    # Create put options chart
+    fig_puts = go.Figure()
+    fig_puts.add_trace(go.Scatter(x=puts1['strike'], y=puts1['midPrice'], mode='lines+markers', name=f'Mid Price ({exp_date1})'))
+    fig_puts.add_trace(go.Scatter(x=puts1['strike'], y=puts1['intrinsicValue'], mode='lines+markers', name=f'Intrinsic Value ({exp_date1})'))
+    fig_puts.add_trace(go.Scatter(x=puts2['strike'], y=puts2['midPrice'], mode='lines+markers', name=f'Mid Price ({exp_date2})'))
+    fig_puts.add_trace(go.Scatter(x=puts2['strike'], y=puts2['intrinsicValue'], mode='lines+markers', name=f'Intrinsic Value ({exp_date2})'))
+    fig_puts.update_layout(title='Put Options', xaxis_title='Strike Price', yaxis_title='Price')
 
 # Display charts
-st.plotly_chart(fig_calls)
-st.plotly_chart(fig_puts)
+with timer.stage("render"):
+    st.plotly_chart(fig_calls)
+    st.plotly_chart(fig_puts)
@@ -0,0 +1,109 @@
+"""
+Implied-volatility surface across every listed expiration of a ticker.
+
+All expirations are fetched concurrently through option_chains, the implied
+volatilities of every out-of-the-money contract are solved in one batch, and
+the scattered points are interpolated onto a regular moneyness x tenor grid
+(linearly in moneyness within each expiration, then linearly in total variance
+across expirations). Built surfaces are kept for SURFACE_TTL_SECONDS.
+"""
+
+import numpy as np
+import pandas as pd
+
+from black_scholes import RISK_FREE_RATE, implied_volatility, quote_mid, time_to_expiry
+from option_chains import get_chains, get_expirations, get_spot
+from ttl_cache import TTLCache
+
+SURFACE_TTL_SECONDS = 2 * 60
+MONEYNESS_RANGE = (0.8, 1.2)
+MONEYNESS_STEPS = 41
+TENOR_STEPS = 30
+MAX_TENOR_YEARS = 2.0
+
+_surfaces = TTLCache(SURFACE_TTL_SECONDS)
+
+
+def surface_points(ticker, rate=RISK_FREE_RATE, now=None):
+    """
+    One row per usable out-of-the-money contract: expiration, tenor (years), strike, moneyness, iv.
+
+    Puts are used below the spot and calls above it, where quotes are most liquid.
+    """
+    spot = get_spot(ticker)
+    chains = get_chains(ticker, get_expirations(ticker))
+    frames = []
+    for expiration, (calls, puts) in chains.items():
+        tenor = time_to_expiry(expiration, now)
+        if tenor <= 0:
+            continue
+        calls = calls.loc[calls['strike'] >= spot, ['strike', 'bid', 'ask']].assign(is_call=True)
+        puts = puts.loc[puts['strike'] < spot, ['strike', 'bid', 'ask']].assign(is_call=False)
+        frames.append(pd.concat([puts, calls]).assign(expiration=expiration, tenor=tenor))
+    if not frames:
+        return pd.DataFrame(columns=['expiration', 'tenor', 'strike', 'moneyness', 'iv', 'is_call'])
+
+    points = pd.concat(frames, ignore_index=True)
+    mid, _ = quote_mid(points['bid'], points['ask'])
+    points['iv'] = implied_volatility(mid, spot, points['strike'].to_numpy(), points['tenor'].to_numpy(), rate,
+                                      points['is_call'].to_numpy())
+    points['moneyness'] = points['strike'] / spot
+    points = points.dropna(subset=['iv'])
+    return points[['expiration', 'tenor', 'strike', 'moneyness', 'iv', 'is_call']].sort_values(
+        ['tenor', 'strike'], ignore_index=True)
+
+
+def interpolate_surface(points, moneyness_grid, tenor_grid):
+    """
+    Implied volatility on a (tenor x moneyness) grid from scattered surface points.
+
+    Each expiration's smile is interpolated in moneyness (NaN outside its quoted range); the
+    smiles are then interpolated in total variance iv^2 * tenor, which keeps calendar spreads
+    arbitrage-free where the quotes are. Tenors outside the quoted range are NaN.
+    """
+    smiles = []
+    tenors = []
+    for tenor, smile in points.groupby('tenor', sort=True):
+        if len(smile) < 2:
+            continue
+        smile = smile.sort_values('moneyness')
+        smiles.append(np.interp(moneyness_grid, smile['moneyness'], smile['iv'], left=np.nan, right=np.nan))
+        tenors.append(tenor)
+    surface = np.full((len(tenor_grid), len(moneyness_grid)), np.nan)
+    if not smiles:
+        return surface
+
+    tenors = np.array(tenors)
+    total_variance = np.array(smiles) ** 2 * tenors[:, None]
+    for column in range(len(moneyness_grid)):
+        quoted = ~np.isnan(total_variance[:, column])
+        if quoted.sum() < 2:
+            continue
+        variance = np.interp(tenor_grid, tenors[quoted], total_variance[quoted, column], left=np.nan, right=np.nan)
+        surface[:, column] = np.sqrt(variance / tenor_grid)
+    return surface
+
+
+def _build_surface(ticker, rate, moneyness_range, max_tenor):
+    points = surface_points(ticker, rate)
+    moneyness_grid = np.linspace(moneyness_range[0], moneyness_range[1], MONEYNESS_STEPS)
+    quoted_tenors = points['tenor'][points['tenor'] <= max_tenor]
+    if quoted_tenors.empty:
+        tenor_grid = np.array([])
+    else:
+        tenor_grid = np.linspace(quoted_tenors.min(), quoted_tenors.max(), TENOR_STEPS)
+    return {
+        'points': points,
+        'moneyness': moneyness_grid,
+        'tenor': tenor_grid,
+        'iv': interpolate_surface(points, moneyness_grid, tenor_grid),
+    }
+
+
+def get_surface(ticker, rate=RISK_FREE_RATE, moneyness_range=MONEYNESS_RANGE, max_tenor=MAX_TENOR_YEARS):
+    """
+    Cached surface dict: the solved `points`, the `moneyness` and `tenor` (years) grid axes,
+    and `iv` with shape (tenors, moneyness).
+    """
+    key = (ticker, rate, tuple(moneyness_range), max_tenor)
+    return _surfaces.get(key, lambda: _build_surface(ticker, rate, moneyness_range, max_tenor))
@@ -2,6 +2,7 @@ import streamlit as st
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
+from perf import StageTimer
 
 def search_walmart(keyword):
     url = f"https://www.walmart.com/search?q={keyword}&sort=best_seller"
@@ -35,18 +36,23 @@ st.title("Walmart Bestsellers Near 48864")
 
 keyword = st.sidebar.text_input("Enter keyword for bestsellers:")
 
+timer = StageTimer("walmart.py")
+
 if keyword:
     st.write(f"Searching for '{keyword}' bestsellers...")
-    results = search_walmart(keyword)
+    with timer.stage("fetch"):
+        results = search_walmart(keyword)
     
-    if results:
+    with timer.stage("local_prices"):
         for item in results:
             local_price = check_local_availability(item['Item'], '48864')
             item['Local Price'] = local_price
-        
-        df = pd.DataFrame(results)
-        st.table(df)
-    else:
-        st.write("No results found. Try a different keyword.")
+
+    with timer.stage("table"):
+        if results:
+            df = pd.DataFrame(results)
+            st.table(df)
+        else:
+            st.write("No results found. Try a different keyword.")
 else:
     st.write("Enter a keyword in the sidebar to search for bestsellers.")